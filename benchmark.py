@@ -0,0 +1,118 @@
+import time
+import tracemalloc
+
+import disease as dis
+import training
+from columnar_knowledge_base import ColumnarKnowledgeBase
+
+
+def createArayDelimitersRecursive(original_array_length: int,
+                                  count_dilimetrs:       int ) -> list[list[int]]:
+    '''the original recursive implementation, kept as a reference for benchmarks'''
+    if count_dilimetrs == 0:
+        return [[]]
+    stop = [*range(original_array_length-count_dilimetrs, original_array_length)]
+    arr  = []
+
+    def create(word, i_let):
+        while word[i_let] < stop[i_let]+1:
+            if len(word) < count_dilimetrs:
+                create([*word, word[-1]+1], i_let+1)
+            else:
+                arr.append(word.copy())
+            word[i_let] += 1
+
+    create([1], 0)
+
+    return arr
+
+
+def measure(func, *args, repeat: int = 3) -> tuple[float, int]:
+    '''best wall time in seconds and peak traced memory in bytes'''
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def benchmarkDelimiters(is_print: bool,
+                        lengths:  tuple[int, ...] = (10, 15, 20, 25),
+                        count_pd_max: int         = 5):
+    def consume(original_array_length, count_dilimetrs):
+        for _ in training.iterDelimiters(original_array_length, count_dilimetrs):
+            pass
+
+    is_equal = True
+    rows = []
+    for length in lengths:
+        for count_dilimetrs in range(count_pd_max):
+            old = createArayDelimitersRecursive(length, count_dilimetrs)
+            new = training.createArayDelimiters(length, count_dilimetrs)
+            is_equal = is_equal and old == new
+
+            t_old, m_old = measure(createArayDelimitersRecursive, length, count_dilimetrs)
+            t_new, m_new = measure(consume, length, count_dilimetrs)
+            rows.append((length, count_dilimetrs, len(old), t_old, t_new, m_old, m_new))
+
+    if is_print:
+        print(f'{"длина":>6} {"разд.":>6} {"вариантов":>10} {"рекурсия, с":>12} {"генератор, с":>13} '
+              f'{"рекурсия, Б":>12} {"генератор, Б":>13}')
+        for row in rows:
+            print(f'{row[0]:>6} {row[1]:>6} {row[2]:>10} {row[3]:>12.5f} {row[4]:>13.5f} '
+                  f'{row[5]:>12} {row[6]:>13}')
+    return is_equal
+
+
+def _objectsWithoutRng(ckb: ColumnarKnowledgeBase) -> list[dis.Disease]:
+    '''the diseases of ckb built by the plain constructors, every object gets the default generator'''
+    diseases = []
+    for i in range(ckb.disease_count):
+        signs = []
+        for j in range(ckb.signs_count):
+            sign_of_disease = ckb.signOfDisease(i, j)
+            periods_dynamic = dis.PeriodsDynamic(sign_of_disease.periods_dynamic.period_time_boundaries.tolist())
+            signs.append(dis.SignOfDisease(sign_of_disease.sign, periods_dynamic, sign_for_pd=sign_of_disease.sign_for_pd))
+        diseases.append(dis.Disease(str(ckb.disease_names[i]), signs))
+    return diseases
+
+
+def benchmarkMemory(is_print:      bool,
+                    disease_count: int = 200,
+                    signs_count:   int = 100,
+                    seed:          int = 1) -> dict[str, float]:
+    '''traced bytes per (disease, sign) pair of an object knowledge base
+    
+    The base is generated in columns and turned into objects, so its size does not 
+    depend on the per-object generator failing for some seeds. 'model' is the base of 
+    ckb.toModel() with the injected generator, 'default rng' is the same base built 
+    by the constructors without rng.
+    '''
+    ckb = ColumnarKnowledgeBase.generate(disease_count, signs_count, seed=seed)
+    for j in range(signs_count):
+        ckb.sign(j)
+    
+    ans = {}
+    for key, build in [('model', ckb.toModel), ('default rng', lambda: _objectsWithoutRng(ckb))]:
+        tracemalloc.start()
+        base = build()
+        ans[key] = tracemalloc.get_traced_memory()[0] / (disease_count * signs_count)
+        tracemalloc.stop()
+        del base
+    
+    if is_print:
+        print(f'{disease_count} болезней x {signs_count} признаков, Б на пару: ' +
+              ', '.join(f'{key} {val:.0f}' for key, val in ans.items()))
+    return ans
+
+
+if __name__ == '__main__':
+    benchmarkMemory(True)
+    if not benchmarkDelimiters(True):
+        raise SystemError('error benchmarkDelimiters')
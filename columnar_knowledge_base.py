@@ -0,0 +1,555 @@
+import json
+import os
+
+import numpy as np
+
+import disease as dis
+import sign as sig
+import model_knowledge_base
+from interval_index import IntervalIndex
+
+
+def decimalExponent(x: np.ndarray) -> np.ndarray:
+    '''the exponent of f'{x:e}' for every element, as SignContinuous takes it'''
+    x = np.abs(np.asarray(x, dtype=np.float64))
+    exponent = np.floor(np.log10(np.where(x > 0, x, 1))).astype(np.int64)
+    # '{:e}' keeps 7 significant digits, 9.9999999 is printed as 1.000000e+01
+    exponent += np.around(x / np.power(10.0, exponent), 6) >= 10
+    return exponent
+
+
+def aroundEach(x: np.ndarray, decimals: np.ndarray) -> np.ndarray:
+    '''np.around with its own number of decimals for every element'''
+    x   = np.asarray(x, dtype=np.float64)
+    ans = np.empty_like(x)
+    for dec in np.unique(decimals):
+        index = decimals == dec
+        ans[index] = np.around(x[index], dec)
+    return ans
+
+
+class ColumnarKnowledgeBase():
+    '''model knowledge base stored as flat NumPy arrays (struct of arrays)
+
+    The (disease, sign) pairs are numbered disease-major: pair = disease * signs_count + sign.
+    The periods of dynamics of all the pairs are stored one after another,
+    the periods of a pair are period_*[pd_offsets[pair]:pd_offsets[pair+1]].
+    Lists of values (possible values of a discrete sign, ZDP of a discrete period)
+    are stored CSR-style: values[offsets[i]:offsets[i+1]].
+
+    Attributes
+    ----------
+    disease_names: np.ndarray (diseases,)
+    sign_names: np.ndarray (signs,)
+    sign_is_discrete: np.ndarray[bool] (signs,)
+    sign_val_min, sign_val_max: np.ndarray[float64] (signs,)
+        bounds of a continuous sign, NaN for discrete ones
+    sign_decimal: np.ndarray[int16] (signs,)
+        rounding of a continuous sign, 0 for discrete ones
+    sign_normal: np.ndarray[float64] (signs,)
+        normal value of a continuous sign, index of the normal value of a discrete one
+        (-1 if it is not a possible value)
+    sign_value_offsets, sign_values:
+        possible values of the discrete signs, CSR
+    pd_count: np.ndarray[int8] (diseases, signs)
+    pd_offsets: np.ndarray[int64] (pairs + 1,)
+    period_lo, period_hi: np.ndarray[int8] (periods,)
+        НГ and ВГ of every period
+    zdp_min, zdp_max: np.ndarray[float64] (periods,)
+        ZDP of a continuous period, NaN for discrete ones
+    zdp_value_offsets, zdp_values:
+        ZDP of the discrete periods, CSR, empty for continuous ones
+
+    Methods
+    ----------
+    generate(disease_count, signs_count, ...)
+        a new random knowledge base generated with array operations
+    fromModel(mkb)
+        columns of an object knowledge base
+    toModel()
+        object knowledge base with the same content
+    sign(j), signOfDisease(i, j), disease(i)
+        objects of the existing classes built from the columns
+    createExamples(n)
+        n examples of every disease, same format as ModelKnowledgeBase.createExamples
+    zdpIntervalIndex()
+        IntervalIndex of the ZDP of all the continuous periods
+    save(path), load(path, mmap=True)
+        a directory with a .npy file per column and header.json, the columns are memory-mapped on load
+    '''
+    FIELDS = ('disease_names', 'sign_names', 'sign_is_discrete', 'sign_val_min', 'sign_val_max',
+              'sign_decimal', 'sign_normal', 'sign_value_offsets', 'sign_values',
+              'pd_count', 'pd_offsets', 'period_lo', 'period_hi',
+              'zdp_min', 'zdp_max', 'zdp_value_offsets', 'zdp_values')
+
+    def __init__(self, rng: np.random.Generator | None = None, **columns) -> None:
+        missing = set(self.FIELDS) - columns.keys()
+        if missing:
+            raise TypeError(f'нет столбцов {sorted(missing)}')
+        extra = columns.keys() - set(self.FIELDS)
+        if extra:
+            raise TypeError(f'лишние столбцы {sorted(extra)}')
+        for key in self.FIELDS:
+            setattr(self, key, columns[key])
+        self._rng   = np.random.default_rng() if rng is None else rng
+        self._signs = {}
+
+    HEADER = 'header.json'
+    FORMAT = ('ColumnarKnowledgeBase', 1)
+
+    def save(self, path: str) -> None:
+        '''writes every column as path/<column>.npy, header.json is written last'''
+        os.makedirs(path, exist_ok=True)
+        columns = {}
+        for key in self.FIELDS:
+            column = np.asarray(getattr(self, key))
+            if column.dtype == object:
+                raise TypeError(f'столбец {key} из объектов python нельзя сохранить без pickle')
+            np.save(os.path.join(path, f'{key}.npy'), column, allow_pickle=False)
+            columns[key] = {'dtype': column.dtype.str, 'shape': list(column.shape)}
+        
+        header = {'format':        self.FORMAT[0],
+                  'version':       self.FORMAT[1],
+                  'disease_count': self.disease_count,
+                  'signs_count':   self.signs_count,
+                  'period_count':  self.period_count,
+                  'columns':       columns}
+        with open(os.path.join(path, self.HEADER), 'w', encoding='utf-8') as f:
+            json.dump(header, f, ensure_ascii=False, indent=1)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, rng: np.random.Generator | None = None):
+        '''mmap: the columns are read-only memory maps and are read from disk only when used'''
+        with open(os.path.join(path, cls.HEADER), encoding='utf-8') as f:
+            header = json.load(f)
+        if (header.get('format'), header.get('version')) != cls.FORMAT:
+            raise TypeError(f'{path} - не база знаний формата {cls.FORMAT}')
+        
+        columns = {}
+        for key, meta in header['columns'].items():
+            column = np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r' if mmap else None, allow_pickle=False)
+            if column.dtype.str != meta['dtype'] or list(column.shape) != meta['shape']:
+                raise TypeError(f'столбец {key} не совпадает с {cls.HEADER}')
+            # a plain ndarray over the same map, np.memmap slicing is slower
+            columns[key] = column.view(np.ndarray)
+        return cls(rng=rng, **columns)
+
+    @property
+    def disease_count(self) -> int:
+        return len(self.disease_names)
+
+    @property
+    def signs_count(self) -> int:
+        return len(self.sign_names)
+
+    @property
+    def period_count(self) -> int:
+        return len(self.period_lo)
+
+    def pair(self, i: int, j: int) -> int:
+        return i * self.signs_count + j
+
+    def periods(self, i: int, j: int) -> slice:
+        pair = self.pair(i, j)
+        return slice(self.pd_offsets[pair], self.pd_offsets[pair + 1])
+
+    @classmethod
+    def fromModel(cls, mkb: model_knowledge_base.ModelKnowledgeBase, rng: np.random.Generator | None = None):
+        signs = [sign.sign for sign in mkb.disease[0].signs]
+
+        sign_is_discrete = np.array([type(sign) == sig.SignDiscrete for sign in signs], dtype=bool)
+        sign_val_min = np.array([np.nan if d else sign.val_min for sign, d in zip(signs, sign_is_discrete)], dtype=np.float64)
+        sign_val_max = np.array([np.nan if d else sign.val_max for sign, d in zip(signs, sign_is_discrete)], dtype=np.float64)
+        sign_decimal = np.array([0 if d else sign.decimal for sign, d in zip(signs, sign_is_discrete)], dtype=np.int16)
+        sign_normal  = np.array([(list(sign.possible_value).index(sign.normal_value) 
+                                  if sign.normal_value in list(sign.possible_value) else -1) if d else sign.normal_value
+                                 for sign, d in zip(signs, sign_is_discrete)], dtype=np.float64)
+        possible_values    = [list(sign.possible_value) if d else [] for sign, d in zip(signs, sign_is_discrete)]
+        sign_value_offsets = np.concatenate([[0], np.cumsum([len(v) for v in possible_values])]).astype(np.int64)
+
+        pd_count  = np.zeros((len(mkb.disease), len(signs)), dtype=np.int8)
+        boundaries, zdp_min, zdp_max, zdp_lengths, zdp_values = [], [], [], [], []
+        for i, d in enumerate(mkb.disease):
+            for j, sign in enumerate(d.signs):
+                pd_count[i, j] = sign.periods_dynamic.pd_count
+                boundaries.append(sign.periods_dynamic.period_time_boundaries)
+                for s_pd in sign.sign_for_pd:
+                    if sign_is_discrete[j]:
+                        zdp_min.append(np.nan)
+                        zdp_max.append(np.nan)
+                        zdp_lengths.append(len(s_pd))
+                        zdp_values += list(s_pd)
+                    else:
+                        zdp_min.append(s_pd[0])
+                        zdp_max.append(s_pd[1])
+                        zdp_lengths.append(0)
+        boundaries = np.concatenate(boundaries).astype(np.int8)
+
+        return cls(rng                = rng,
+                   disease_names      = np.array([d.name for d in mkb.disease]),
+                   sign_names         = np.array([sign.name for sign in signs]),
+                   sign_is_discrete   = sign_is_discrete,
+                   sign_val_min       = sign_val_min,
+                   sign_val_max       = sign_val_max,
+                   sign_decimal       = sign_decimal,
+                   sign_normal        = sign_normal,
+                   sign_value_offsets = sign_value_offsets,
+                   sign_values        = np.array([v for values in possible_values for v in values]),
+                   pd_count           = pd_count,
+                   pd_offsets         = np.concatenate([[0], np.cumsum(pd_count.ravel(), dtype=np.int64)]),
+                   period_lo          = boundaries[:, 0].copy(),
+                   period_hi          = boundaries[:, 1].copy(),
+                   zdp_min            = np.array(zdp_min, dtype=np.float64),
+                   zdp_max            = np.array(zdp_max, dtype=np.float64),
+                   zdp_value_offsets  = np.concatenate([[0], np.cumsum(zdp_lengths)]).astype(np.int64),
+                   zdp_values         = np.array(zdp_values))
+
+    @classmethod
+    def generate(cls,
+                 disease_count:                    int                 = 2,
+                 signs_count:                      int                 = 6,
+                 *,
+                 part_discr_cont:                  float               = 0.5,
+                 count_value_max_discr:            int                 = 20,
+                 boundaries_value_mean_cont:       tuple[float, float] = [-10, 10],
+                 boundaries_value_exponent_cont:   tuple[float, float] = [-4, 2],
+                 pd_count_max:                     int                 = 5,
+                 pd_len_max:                       int                 = 25,
+                 boundaries_len_sample_in_percent: tuple[float, float] = [0.1, 0.5],
+                 seed:                             int | None          = None,
+                 rng:                              np.random.Generator | None = None,
+                 chunk_size:                       int                 = 1 << 16):
+        '''generates signs, periods of dynamics and ZDP with array operations
+        
+        Same rules as ModelKnowledgeBase.generateSings, generateDisease and
+        Sign.createSample, applied to all the (disease, sign) pairs at once, one 
+        period position after another. Rounded continuous ZDP are clipped into their
+        gap, so rounding never pushes a ZDP outside the sign's bounds.
+        chunk_size: pairs per step, bounds the temporary arrays
+        '''
+        if not (boundaries_value_mean_cont[0] <= boundaries_value_mean_cont[1]):
+            raise KeyError('ваш boundaries_value_mean_cont - полный бред')
+        if not (-5 <= boundaries_value_exponent_cont[0] <= boundaries_value_exponent_cont[1] < 6):
+            raise KeyError('ваш boundaries_value_mean_cont - полный бред')
+        if not (2 <= pd_count_max and 2 < pd_len_max <= 25):
+            raise TypeError("что за фигню в ограничения period_time напихали?!?")
+        if rng is None:
+            rng = np.random.default_rng(seed)
+        
+        # signs
+        discrete_count   = int(signs_count * part_discr_cont)
+        continuous_count = signs_count - discrete_count
+        sign_is_discrete = np.arange(signs_count) < discrete_count
+        
+        value_count = np.zeros(signs_count, dtype=np.int64)
+        value_count[:discrete_count] = rng.integers(2, count_value_max_discr + 1, size=discrete_count)
+        sign_value_offsets = np.concatenate([[0], np.cumsum(value_count)])
+        sign_values = np.arange(sign_value_offsets[-1]) - np.repeat(sign_value_offsets[:-1], value_count)
+        
+        val_mean = rng.random(size=continuous_count) * (boundaries_value_mean_cont[1] - boundaries_value_mean_cont[0]) \
+            + boundaries_value_mean_cont[0]
+        val_delt = rng.random(size=continuous_count) * \
+                   np.power(10, rng.integers(low  = boundaries_value_exponent_cont[0],
+                                             high = boundaries_value_exponent_cont[1]+1,
+                                             size = continuous_count), dtype = np.float64)
+        val_min = val_mean - val_delt / 2
+        val_max = val_mean + val_delt / 2
+        decimal = -decimalExponent(val_max - val_min) + 2
+        
+        sign_val_min = np.full(signs_count, np.nan)
+        sign_val_max = np.full(signs_count, np.nan)
+        sign_decimal = np.zeros(signs_count, dtype=np.int16)
+        sign_normal  = np.zeros(signs_count, dtype=np.float64)
+        sign_val_min[discrete_count:] = aroundEach(val_min, decimal)
+        sign_val_max[discrete_count:] = aroundEach(val_max, decimal)
+        sign_decimal[discrete_count:] = decimal
+        sign_normal[discrete_count:]  = (val_min + val_max) / 2
+        
+        # periods of dynamics
+        pair_count = disease_count * signs_count
+        pd_count   = rng.integers(2, pd_count_max + 1, size=pair_count).astype(np.int8)
+        pd_offsets = np.concatenate([[0], np.cumsum(pd_count, dtype=np.int64)])
+        period_count = int(pd_offsets[-1])
+        
+        a = rng.integers(1, pd_len_max, size=period_count)
+        b = rng.integers(1, pd_len_max - 1, size=period_count)
+        b += b >= a
+        period_lo = np.minimum(a, b).astype(np.int8)
+        period_hi = np.maximum(a, b).astype(np.int8)
+        
+        # ZDP
+        pair_sign   = np.tile(np.arange(signs_count), disease_count)
+        zdp_min     = np.full(period_count, np.nan)
+        zdp_max     = np.full(period_count, np.nan)
+        zdp_lengths = np.zeros(period_count, dtype=np.int64)
+        zdp_chosen  = []
+        
+        for pairs in np.array_split(np.flatnonzero(sign_is_discrete[pair_sign]), 
+                                    max(1, -(-pair_count // chunk_size))):
+            if len(pairs) == 0:
+                continue
+            count = value_count[pair_sign[pairs]]
+            prev  = np.zeros((len(pairs), int(count.max())), dtype=bool)
+            count_min = np.ceil(boundaries_len_sample_in_percent[0] * count).astype(np.int64)
+            count_max = np.ceil(boundaries_len_sample_in_percent[1] * count).astype(np.int64)
+            for k in range(int(pd_count[pairs].max())):
+                alive  = pd_count[pairs] > k
+                len_max = count - prev.sum(axis=1)
+                high    = np.minimum(count_max, len_max)
+                if np.any(alive & ~((0 < count_min) & (count_min <= high))):
+                    raise TypeError('у дискретного признака не хватает значений для выборки')
+                sample_len = rng.integers(count_min, np.maximum(high, count_min) + 1)
+                
+                # a random order of the allowed values, the first sample_len of them are taken
+                keys = rng.random(prev.shape)
+                keys[prev | (np.arange(prev.shape[1]) >= count[:, None])] = np.inf
+                order = np.argsort(keys, axis=1)
+                taken = np.arange(prev.shape[1]) < sample_len[:, None]
+                
+                period = pd_offsets[pairs[alive]] + k
+                zdp_lengths[period] = sample_len[alive]
+                zdp_chosen.append((period, order[alive], taken[alive]))
+                
+                prev = np.zeros_like(prev)
+                np.put_along_axis(prev, order, taken, axis=1)
+        
+        for pairs in np.array_split(np.flatnonzero(~sign_is_discrete[pair_sign]), 
+                                    max(1, -(-pair_count // chunk_size))):
+            if len(pairs) == 0:
+                continue
+            sign  = pair_sign[pairs]
+            s_min, s_max, dec = sign_val_min[sign], sign_val_max[sign], sign_decimal[sign]
+            len_lo = boundaries_len_sample_in_percent[0] * (s_max - s_min)
+            len_hi = boundaries_len_sample_in_percent[1] * (s_max - s_min)
+            prev_min, prev_max = s_min, s_min
+            for k in range(int(pd_count[pairs].max())):
+                alive = pd_count[pairs] > k
+                if k == 0:
+                    gap_lo, gap_hi = s_min, s_max
+                else:
+                    delta_lo, delta_hi = prev_min - s_min, s_max - prev_max
+                    total    = delta_lo + delta_hi
+                    is_lo    = rng.random(len(pairs)) * np.where(total > 0, total, 1) < delta_lo
+                    is_lo    = np.where(np.minimum(delta_lo, delta_hi) > len_lo, is_lo, delta_lo >= delta_hi)
+                    gap_lo   = np.where(is_lo, s_min, prev_max)
+                    gap_hi   = np.where(is_lo, prev_min, s_max)
+                    # finished pairs keep drawing from the whole range, their draws are dropped
+                    gap_lo   = np.where(alive, gap_lo, s_min)
+                    gap_hi   = np.where(alive, gap_hi, s_max)
+                gap = gap_hi - gap_lo
+                if np.any(alive & (len_lo > gap)):
+                    raise TypeError('у непрерывного признака нет промежутка нужной длины')
+                
+                sample_len   = aroundEach(rng.uniform(len_lo, np.maximum(np.minimum(len_hi, gap), len_lo)), dec)
+                sample_len   = np.minimum(sample_len, gap)
+                start_hi     = np.maximum(gap_hi - sample_len, gap_lo)
+                sample_start = aroundEach(rng.uniform(gap_lo, start_hi), dec)
+                sample_start = np.clip(sample_start, gap_lo, start_hi)
+                
+                period = pd_offsets[pairs[alive]] + k
+                zdp_min[period] = sample_start[alive]
+                zdp_max[period] = (sample_start + sample_len)[alive]
+                prev_min, prev_max = sample_start, sample_start + sample_len
+        
+        zdp_value_offsets = np.concatenate([[0], np.cumsum(zdp_lengths)])
+        zdp_values = np.zeros(zdp_value_offsets[-1], dtype=np.int64)
+        for period, order, taken in zdp_chosen:
+            index = zdp_value_offsets[period][:, None] + np.cumsum(taken, axis=1) - 1
+            zdp_values[index[taken]] = order[taken]
+        
+        return cls(rng                = rng,
+                   disease_names      = np.array([f'болезнь {i}' for i in range(disease_count)]),
+                   sign_names         = np.array([f'дискретный {i+1}' for i in range(discrete_count)] + 
+                                                 [f'непрерывный {i+1}' for i in range(continuous_count)]),
+                   sign_is_discrete   = sign_is_discrete,
+                   sign_val_min       = sign_val_min,
+                   sign_val_max       = sign_val_max,
+                   sign_decimal       = sign_decimal,
+                   sign_normal        = sign_normal,
+                   sign_value_offsets = sign_value_offsets,
+                   sign_values        = sign_values,
+                   pd_count           = pd_count.reshape(disease_count, signs_count),
+                   pd_offsets         = pd_offsets,
+                   period_lo          = period_lo,
+                   period_hi          = period_hi,
+                   zdp_min            = zdp_min,
+                   zdp_max            = zdp_max,
+                   zdp_value_offsets  = zdp_value_offsets,
+                   zdp_values         = zdp_values)
+
+    def sign(self, j: int) -> sig.Sign:
+        '''the sign object, one per sign so that all the diseases share it like in ModelKnowledgeBase'''
+        if j in self._signs:
+            return self._signs[j]
+        name = str(self.sign_names[j])
+        if self.sign_is_discrete[j]:
+            values = self.sign_values[self.sign_value_offsets[j]:self.sign_value_offsets[j + 1]].tolist()
+            normal_value = values[int(self.sign_normal[j])] if self.sign_normal[j] >= 0 else None
+            sign = sig.SignDiscrete(name, values, normal_value, rng=self._rng)
+        else:
+            sign = sig.SignContinuous(name, self.sign_val_min[j], self.sign_val_max[j], self.sign_normal[j], rng=self._rng)
+            # the stored bounds are already rounded, rounding them again may change decimal
+            sign.decimal        = int(self.sign_decimal[j])
+            sign.possible_value = [self.sign_val_min[j], self.sign_val_max[j]]
+        self._signs[j] = sign
+        return sign
+
+    def signOfDisease(self, i: int, j: int) -> dis.SignOfDisease:
+        periods = self.periods(i, j)
+        periods_dynamic = dis.PeriodsDynamic(np.stack([self.period_lo[periods], self.period_hi[periods]], axis=1),
+                                             rng=self._rng)
+        if self.sign_is_discrete[j]:
+            offsets = self.zdp_value_offsets[periods.start:periods.stop + 1]
+            sign_for_pd = [self.zdp_values[a:b] for a, b in zip(offsets[:-1], offsets[1:])]
+        else:
+            sign_for_pd = [[a, b] for a, b in zip(self.zdp_min[periods], self.zdp_max[periods])]
+        return dis.SignOfDisease(self.sign(j), periods_dynamic, rng=self._rng, sign_for_pd=sign_for_pd)
+
+    def disease(self, i: int) -> dis.Disease:
+        return dis.Disease(str(self.disease_names[i]), [self.signOfDisease(i, j) for j in range(self.signs_count)])
+
+    def toModel(self) -> model_knowledge_base.ModelKnowledgeBase:
+        mkb = model_knowledge_base.ModelKnowledgeBase(disease_count=self.disease_count,
+                                                      signs_count=self.signs_count,
+                                                      rng=self._rng)
+        signs = [self.sign(j) for j in range(self.signs_count)]
+        mkb._sings_discrete  = [sign for sign, d in zip(signs, self.sign_is_discrete) if d]
+        mkb._signs_continous = [sign for sign, d in zip(signs, self.sign_is_discrete) if not d]
+        mkb.disease          = [self.disease(i) for i in range(self.disease_count)]
+        return mkb
+
+    def periodPairs(self, periods: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''(disease, sign) of every period number'''
+        pair = np.searchsorted(self.pd_offsets, periods, side='right') - 1
+        return pair // self.signs_count, pair % self.signs_count
+
+    def zdpIntervalIndex(self) -> tuple[IntervalIndex, np.ndarray]:
+        '''IntervalIndex of the ZDP of all the continuous periods and the period number of every interval'''
+        periods = np.flatnonzero(~np.isnan(self.zdp_min))
+        return IntervalIndex(self.zdp_min[periods], self.zdp_max[periods]), periods
+
+    def createExamples(self, n: int, *, count_mesurment_in_pd_max = 3) -> dict[str, dis.DiseaseExemples]:
+        '''n examples of every disease, all the periods of all the pairs are sampled at once'''
+        times, mask = dis.sampleMeasurementTimes(self._rng,
+                                                 np.stack([self.period_lo, self.period_hi], axis=1),
+                                                 n,
+                                                 count_mesurment_in_pd_max,
+                                                 self.pd_offsets[:-1][self.pd_count.ravel() > 0])
+
+        period_sign = np.repeat(np.tile(np.arange(self.signs_count), self.disease_count), self.pd_count.ravel())
+        discrete    = self.sign_is_discrete[period_sign]
+        values_cont = dis.sampleValuesContinuous(self._rng,
+                                                 self.zdp_min[~discrete],
+                                                 self.zdp_max[~discrete],
+                                                 self.sign_decimal[period_sign[~discrete]],
+                                                 (n, int(np.sum(~discrete)), count_mesurment_in_pd_max))
+        lengths      = np.diff(self.zdp_value_offsets)[discrete]
+        values_discr = dis.sampleValuesDiscrete(self._rng,
+                                                np.concatenate([[0], np.cumsum(lengths)]),
+                                                self.zdp_values,
+                                                (n, int(np.sum(discrete)), count_mesurment_in_pd_max))
+        # position of every period inside its own kind of values
+        position = np.where(discrete, np.cumsum(discrete) - 1, np.cumsum(~discrete) - 1)
+
+        ans = {}
+        for i, disease_name in enumerate(self.disease_names):
+            examples_disease = {'signs_discrete': {}, 'signs_continuous': {}}
+            for j, sign_name in enumerate(self.sign_names):
+                periods = self.periods(i, j)
+                if self.sign_is_discrete[j]:
+                    values = values_discr[:, position[periods]]
+                    ty     = 'signs_discrete'
+                else:
+                    values = values_cont[:, position[periods]]
+                    ty     = 'signs_continuous'
+                mask_pair = mask[:, periods]
+                offsets   = np.zeros(n + 1, dtype=np.int64)
+                np.cumsum(mask_pair.sum(axis=(1, 2)), out=offsets[1:])
+                examples_disease[ty][str(sign_name)] = {'time':    times[:, periods][mask_pair],
+                                                        'value':   values[mask_pair],
+                                                        'offsets': offsets}
+            ans[str(disease_name)] = examples_disease
+        return ans
+
+
+if __name__ == '__main__':
+    def checkColumnarKnowledgeBase(is_print: bool):
+        mkb = model_knowledge_base.ModelKnowledgeBase(disease_count=3, signs_count=6, seed=1)
+        mkb.generateSings(boundaries_value_exponent_cont=[2, 3], count_value_max_discr=10)
+        mkb.generateDisease(pd_count_max=4)
+
+        ckb = ColumnarKnowledgeBase.fromModel(mkb)
+        test = all(a.equals(b) for a, b in zip(mkb.data_frame[:2], ckb.toModel().data_frame[:2]))
+        test = test and mkb.data_frame[2].drop(columns='ЗДП').equals(ckb.toModel().data_frame[2].drop(columns='ЗДП'))
+
+        examples = ckb.createExamples(100)
+        for i, d in enumerate(mkb.disease):
+            for j, sign in enumerate(d.signs):
+                ty = 'signs_discrete' if ckb.sign_is_discrete[j] else 'signs_continuous'
+                ex = examples[d.name][ty][sign.sign.name]
+                total_time = sign.periods_dynamic.period_time_boundaries[:, 1].sum()
+                for a, b in zip(ex['offsets'][:-1], ex['offsets'][1:]):
+                    test = test and np.all(np.diff(ex['time'][a:b]) > 0) and ex['time'][b - 1] <= total_time
+
+        if is_print:
+            print(*ckb.toModel().data_frame, sep='\n\n')
+        return test
+
+    def checkGenerate(is_print: bool):
+        ckb  = ColumnarKnowledgeBase.generate(50, 20, seed=1)
+        test = all(np.array_equal(getattr(ckb, name), getattr(ColumnarKnowledgeBase.generate(50, 20, seed=1), name),
+                                  equal_nan=getattr(ckb, name).dtype.kind == 'f')
+                   for name in ColumnarKnowledgeBase.FIELDS)
+        test = test and bool(np.all((1 <= ckb.period_lo) & (ckb.period_lo < ckb.period_hi) & (ckb.period_hi <= 24)))
+        for i in range(ckb.disease_count):
+            for j in range(ckb.signs_count):
+                zdp = ckb.signOfDisease(i, j).sign_for_pd
+                if ckb.sign_is_discrete[j]:
+                    test = test and all(len(z) > 0 and not set(a) & set(z) for a, z in zip([[]] + zdp, zdp))
+                else:
+                    test = test and all(ckb.sign_val_min[j] <= z[0] <= z[1] <= ckb.sign_val_max[j] for z in zdp)
+                    test = test and all(a[1] <= z[0] or z[1] <= a[0] for a, z in zip(zdp, zdp[1:]))
+        if is_print:
+            print(*ckb.toModel().data_frame, sep='\n\n')
+        return test
+
+    def checkZdpIntervalIndex(is_print: bool):
+        ckb = ColumnarKnowledgeBase.generate(40, 20, seed=3)
+        index, periods = ckb.zdpIntervalIndex()
+        values = np.random.default_rng(3).uniform(np.nanmin(ckb.zdp_min), np.nanmax(ckb.zdp_max), 50)
+        query, interval = index.stabMany(values)
+        test = True
+        for i, x in enumerate(values):
+            test = test and np.array_equal(np.sort(periods[interval[query == i]]),
+                                           np.flatnonzero((ckb.zdp_min <= x) & (x <= ckb.zdp_max)))
+        disease, sign = ckb.periodPairs(periods)
+        test = test and not ckb.sign_is_discrete[sign].any()
+        if is_print:
+            print(len(periods), 'периодов,', len(query), 'попаданий')
+        return test
+
+    def checkSaveLoad(is_print: bool):
+        import tempfile
+        ckb = ColumnarKnowledgeBase.generate(20, 10, seed=2)
+        with tempfile.TemporaryDirectory() as path:
+            ckb.save(path)
+            test = True
+            for mmap in [True, False]:
+                loaded = ColumnarKnowledgeBase.load(path, mmap=mmap)
+                test = test and all(np.array_equal(getattr(ckb, name), getattr(loaded, name),
+                                                   equal_nan=getattr(ckb, name).dtype.kind == 'f')
+                                    for name in ColumnarKnowledgeBase.FIELDS)
+                test = test and all(a.equals(b) for a, b in zip(ckb.toModel().data_frame, loaded.toModel().data_frame))
+            if is_print:
+                print(*sorted(os.listdir(path)), sep='\n')
+            del loaded
+        return test
+
+    if not checkColumnarKnowledgeBase(False):
+        raise SystemError('error checkColumnarKnowledgeBase')
+    if not checkGenerate(False):
+        raise SystemError('error checkGenerate')
+    if not checkSaveLoad(False):
+        raise SystemError('error checkSaveLoad')
+    if not checkZdpIntervalIndex(False):
+        raise SystemError('error checkZdpIntervalIndex')
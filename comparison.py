@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+from lazy_knowledge import isNonEmpty
+
+
+ZDP_CLASSES = ['совпадает', 'ИФБЗ подмножество МБЗ', 'МБЗ подмножество ИФБЗ', 'другое']
+
+
+def comparisonCountPD(model) -> tuple[pd.DataFrame, pd.Series, float]:
+    '''ЧПД of the model knowledge base against the largest PD count with candidates, for every (disease, sign)
+
+    Returns
+    ----------
+    table: pd.DataFrame ['ЧПД МБЗ', 'ИФБЗ'] indexed by (болезнь, признак)
+    match: pd.Series
+        percent of the signs of every disease where the counts match
+    mean: float
+        mean of match
+    '''
+    mkb = model.mkb
+    _, data_2, _ = mkb.data_frame
+    diseases = [x.name for x in mkb.disease]
+    signs    = [x.name for x in mkb.signs]
+    d = [name for name in diseases for _ in signs]
+    s = [name for _ in diseases for name in signs]
+
+    count_mkb  = data_2.loc[diseases, signs].to_numpy().ravel()
+    count_igkb = np.array([next((i for i in range(model.count_pd_max, 1, -1) if isNonEmpty(model.posible_pd[d_i][s_i], f'{i}')), 1)
+                           for d_i, s_i in zip(d, s)], dtype=np.int64)
+
+    table = pd.DataFrame({'ЧПД МБЗ': count_mkb, 'ИФБЗ': count_igkb},
+                         index=pd.MultiIndex.from_arrays([d, s], names=['болезнь', 'признак']))
+    match = np.around((table['ЧПД МБЗ'] == table['ИФБЗ']).groupby(level=0).sum() / len(signs) * 100, 1)
+    return table, match, np.around(np.mean(match), 1)
+
+
+def _discreteMasks(sign_id: np.ndarray,
+                   values_1: list[np.ndarray],
+                   values_2: list[np.ndarray]) -> tuple[np.ndarray, np.ndarray] | None:
+    '''the value sets of the rows as uint64 bit masks, a bit per distinct value of a sign;
+    None if a sign has more than 64 values'''
+    rows_1 = np.repeat(np.arange(len(values_1)), [len(v) for v in values_1])
+    rows_2 = np.repeat(np.arange(len(values_2)), [len(v) for v in values_2])
+    rows   = np.concatenate([rows_1, rows_2])
+    values = np.concatenate([*values_1, *values_2]) if len(rows) else np.zeros(0)
+    signs  = sign_id[rows]
+
+    # rank of every value among the distinct values of its sign
+    order  = np.lexsort((values, signs))
+    is_new = np.ones(len(order), dtype=bool)
+    is_new[1:] = (signs[order][1:] != signs[order][:-1]) | (values[order][1:] != values[order][:-1])
+    distinct   = np.cumsum(is_new) - 1
+    sign_first = np.zeros(len(order), dtype=np.int64)
+    is_first_of_sign = np.ones(len(order), dtype=bool)
+    is_first_of_sign[1:] = signs[order][1:] != signs[order][:-1]
+    sign_first[is_first_of_sign] = distinct[is_first_of_sign]
+    sign_first = np.maximum.accumulate(sign_first)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = distinct - sign_first
+    if len(rank) and rank.max() >= 64:
+        return None
+
+    bits   = np.left_shift(np.uint64(1), rank.astype(np.uint64))
+    mask_1 = np.zeros(len(values_1), dtype=np.uint64)
+    mask_2 = np.zeros(len(values_2), dtype=np.uint64)
+    np.bitwise_or.at(mask_1, rows_1, bits[:len(rows_1)])
+    np.bitwise_or.at(mask_2, rows_2, bits[len(rows_1):])
+    return mask_1, mask_2
+
+
+def classifyDiscrete(sign_id: np.ndarray, values_1: list[np.ndarray], values_2: list[np.ndarray]) -> np.ndarray:
+    '''index in ZDP_CLASSES for every pair of value sets (learned, reference)'''
+    masks = _discreteMasks(sign_id, values_1, values_2)
+    if masks is None:
+        sets = [(set(a), set(b)) for a, b in zip(values_1, values_2)]
+        eq  = np.array([a == b for a, b in sets], dtype=bool)
+        sub = np.array([a <= b for a, b in sets], dtype=bool)
+        sup = np.array([b <= a for a, b in sets], dtype=bool)
+    else:
+        mask_1, mask_2 = masks
+        eq  = mask_1 == mask_2
+        sub = mask_1 & ~mask_2 == 0
+        sup = mask_2 & ~mask_1 == 0
+    return np.select([eq, sub, sup], [0, 1, 2], 3)
+
+
+def classifyContinuous(min_1: np.ndarray, max_1: np.ndarray, min_2: np.ndarray, max_2: np.ndarray) -> np.ndarray:
+    '''index in ZDP_CLASSES for every pair of intervals (learned, reference)'''
+    eq  = (min_1 == min_2) & (max_1 == max_2)
+    sub = (min_2 <= min_1) & (min_1 <= max_1) & (max_1 <= max_2)
+    sup = (min_1 <= min_2) & (min_2 <= max_2) & (max_2 <= max_1)
+    return np.select([eq, sub, sup], [0, 1, 2], 3)
+
+
+def comparisonZDP(model) -> tuple[pd.DataFrame, pd.DataFrame]:
+    '''ZDP of every candidate against the model knowledge base, for the (disease, sign) pairs with matching ЧПД
+
+    The learned and the reference ZDP are collected once into aligned lists and
+    classified with array operations: intervals by their bounds, value sets as bit masks.
+
+    Returns
+    ----------
+    table: pd.DataFrame ['ЗДП для ИФБЗ', 'ЗДП для МБЗ']
+        indexed by (заболевание, признак, вариант решения, номер ПД)
+    classes: pd.DataFrame ZDP_CLASSES
+        percent of the candidates of every (disease, sign) in every class
+    '''
+    _, _, data_3 = model.mkb.data_frame
+    count_pd     = comparisonCountPD(model)[0]
+    matched      = count_pd.index[count_pd['ЧПД МБЗ'] == count_pd['ИФБЗ']]
+    data_check   = data_3[data_3.index.droplevel(2).isin(matched)]
+    count_pd     = count_pd['ЧПД МБЗ'].to_dict()
+
+    disease_arr, sign_arr, answer_arr, pd_arr, zdp_igkb, zdp_mkb = [], [], [], [], [], []
+    pair, decoded = None, []
+    for (disease, sign, pd_num), zdp_ref in zip(data_check.index, data_check['ЗДП']):
+        if pair != (disease, sign):
+            pair = (disease, sign)
+            decoded = [model.decodeZDP(sign, candidate['zdp'])
+                       for candidate in model.posible_pd[disease][sign][f'{count_pd[pair]}']]
+        for i, zdp in enumerate(decoded):
+            disease_arr.append(disease)
+            sign_arr.append(sign)
+            answer_arr.append(i + 1)
+            pd_arr.append(pd_num)
+            zdp_igkb.append(np.array([*zdp[pd_num - 1]]))
+            zdp_mkb.append(zdp_ref)
+
+    index = pd.MultiIndex.from_arrays([disease_arr, sign_arr, answer_arr, pd_arr],
+                                      names=['заболевание', 'признак', 'вариант решения', 'номер ПД'])
+    table = pd.DataFrame({'ЗДП для ИФБЗ': zdp_igkb, 'ЗДП для МБЗ': zdp_mkb}, index=index)
+    table = table.sort_index(level=[0, 1, 2, 3])
+
+    # the type is taken from the sign name, as the table shows it
+    sign_kind   = np.array([name.split()[0] for name in sign_arr], dtype=object)
+    is_discrete = sign_kind == 'дискретный'
+    if not np.all(is_discrete | (sign_kind == 'непрерывный')):
+        raise TypeError("Я не знаю тип признака")
+
+    classes = np.zeros(len(sign_arr), dtype=np.int64)
+    rows = np.flatnonzero(is_discrete)
+    if len(rows):
+        _, sign_id = np.unique(np.array(sign_arr, dtype=object)[rows].astype(str), return_inverse=True)
+        classes[rows] = classifyDiscrete(sign_id, [zdp_igkb[r] for r in rows], [zdp_mkb[r] for r in rows])
+    rows = np.flatnonzero(~is_discrete)
+    if len(rows):
+        bounds_igkb = np.array([zdp_igkb[r] for r in rows], dtype=np.float64).reshape(-1, 2)
+        bounds_mkb  = np.array([zdp_mkb[r] for r in rows], dtype=np.float64).reshape(-1, 2)
+        classes[rows] = classifyContinuous(bounds_igkb[:, 0], bounds_igkb[:, 1], bounds_mkb[:, 0], bounds_mkb[:, 1])
+
+    counts = pd.DataFrame(classes[:, None] == np.arange(len(ZDP_CLASSES)), index=index.droplevel([2, 3]),
+                          columns=ZDP_CLASSES).groupby(level=[0, 1]).sum()
+    shares = np.around(counts.to_numpy() / counts.to_numpy().sum(axis=1, keepdims=True) * 100, 1)
+    return table, pd.DataFrame(shares, index=counts.index, columns=ZDP_CLASSES)
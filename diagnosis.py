@@ -0,0 +1,254 @@
+import numpy as np
+import pandas as pd
+
+import sign as sig
+from disease import isExamplesBatch
+from interval_index import IntervalIndex
+
+
+def _isDiseaseExemple(example: dict) -> bool:
+    '''True for a DiseaseExemple or DiseaseExemples, False for {disease name: DiseaseExemple(s)}'''
+    return len(example) > 0 and set(example) <= {'signs_discrete', 'signs_continuous'}
+
+
+def _unionIntervals(group: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''the union of the intervals of every group as disjoint intervals: (group, lo, hi)'''
+    order = np.lexsort((lo, group))
+    group, lo, hi = group[order], lo[order], hi[order]
+    ans = ([], [], [])
+    for g in np.unique(group):
+        g_lo, g_hi = lo[group == g], hi[group == g]
+        reach = np.maximum.accumulate(g_hi)
+        # an interval starts a new piece if it begins after everything before it ends
+        first = np.flatnonzero(np.r_[True, g_lo[1:] > reach[:-1]])
+        last  = np.r_[first[1:], len(g_lo)] - 1
+        ans[0].append(np.full(len(first), g))
+        ans[1].append(g_lo[first])
+        ans[2].append(reach[last])
+    if not ans[0]:
+        return np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0)
+    return tuple(np.concatenate(a) for a in ans)
+
+
+class DiagnosisIndex():
+    '''which diseases of a knowledge base a patient's example is consistent with
+
+    A disease is consistent with an example if every measured value of every sign
+    lies in a ZDP the knowledge base has for this disease and sign (of any period
+    and any candidate), the measurement times are not checked. For every sign the
+    index keeps where a value leads: a discrete sign a posting list of diseases
+    per value, a continuous sign an IntervalIndex of the union of the ZDP of every
+    disease. A query looks only at the signs the patient has and prunes the
+    diseases sign by sign.
+
+    Attributes
+    ----------
+    diseases: list[str]
+        the columns of every answer
+
+    Methods
+    ----------
+    add(disease_name, sign_name, sign_type, zdp)
+        the ZDP of all the periods of one candidate, before build()
+    build()
+        turns the added ZDP into the index, returns self
+    covered(sign_name, values)
+        bool array (len(values), len(diseases)): which diseases allow every value
+    diagnose(example)
+        names of the diseases consistent with one example
+    diagnoseBatch(examples)
+        share of the measurements every disease explains, for many examples at once
+    '''
+    def __init__(self, diseases: list[str]) -> None:
+        self.diseases      = list(diseases)
+        self._disease_ids  = {name: i for i, name in enumerate(self.diseases)}
+        self._sign_types   = {}
+        self._added        = {}
+        # sign name -> ({value: row}, posting lists (values + 1, diseases)), the last row for unknown values
+        self._discrete     = {}
+        # sign name -> (IntervalIndex of the ZDP, disease of every interval)
+        self._continuous   = {}
+
+    @classmethod
+    def fromModel(cls, model):
+        '''index of the candidates of InductiveShapingModel.posible_pd'''
+        index = cls(list(model.posible_pd))
+        for disease_name, signs in model.posible_pd.items():
+            for sign_name, igkb in signs.items():
+                for candidates in igkb.values():
+                    for candidate in candidates:
+                        index.add(disease_name, sign_name, model._sign_types[sign_name],
+                                  model.decodeZDP(sign_name, candidate['zdp']))
+        return index.build()
+
+    @classmethod
+    def fromKnowledgeBase(cls, mkb):
+        '''index of the true ZDP of ModelKnowledgeBase, rounded as the examples are'''
+        index = cls([d.name for d in mkb.disease])
+        for d in mkb.disease:
+            for sign in d.signs:
+                sign_type = 'continuous' if type(sign.sign) == sig.SignContinuous else 'discrete'
+                index.add(d.name, sign.sign.name, sign_type, sign.zdpRows())
+        return index.build()
+
+    def add(self, disease_name: str, sign_name: str, sign_type: str, zdp: list) -> None:
+        if not (sign_type in ['discrete', 'continuous']):
+            raise TypeError(f'{sign_type} not SignType')
+        if self._sign_types.setdefault(sign_name, sign_type) != sign_type:
+            raise TypeError(f'у признака "{sign_name}" два типа')
+        disease_id = self._disease_ids[disease_name]
+        added = self._added.setdefault(sign_name, [])
+        for zdp_pd in zdp:
+            added.append((disease_id, zdp_pd))
+
+    def build(self):
+        for sign_name, added in self._added.items():
+            if self._sign_types[sign_name] == 'discrete':
+                value_rows = {}
+                for _, values in added:
+                    for val in values:
+                        value_rows.setdefault(val, len(value_rows))
+                posting = np.zeros((len(value_rows) + 1, len(self.diseases)), dtype=bool)
+                for disease_id, values in added:
+                    posting[[value_rows[val] for val in values], disease_id] = True
+                self._discrete[sign_name] = value_rows, posting
+            else:
+                intervals = np.array([(disease_id, zdp_pd[0], zdp_pd[1]) for disease_id, zdp_pd in added],
+                                     dtype=np.float64).reshape(-1, 3)
+                disease_id, val_min, val_max = _unionIntervals(intervals[:, 0].astype(np.int64), intervals[:, 1], intervals[:, 2])
+                self._continuous[sign_name] = IntervalIndex(val_min, val_max), disease_id
+        self._added = {}
+        return self
+
+    def covered(self, sign_name: str, values) -> np.ndarray:
+        if sign_name in self._discrete:
+            value_rows, posting = self._discrete[sign_name]
+            distinct, inverse = np.unique(np.asarray(values), return_inverse=True)
+            rows = np.array([value_rows.get(val, -1) for val in distinct.tolist()], dtype=np.int64)
+            return posting[rows[inverse.reshape(-1)]]
+        ans = np.zeros((len(values), len(self.diseases)), dtype=bool)
+        if sign_name in self._continuous and len(values):
+            intervals, disease_id = self._continuous[sign_name]
+            rows, hit = intervals.stabMany(values)
+            ans[rows, disease_id[hit]] = True
+        return ans
+
+    def diagnose(self, example: dict) -> list[str]:
+        '''example: DiseaseExemple of one patient'''
+        alive = np.ones(len(self.diseases), dtype=bool)
+        for signs in example.values():
+            for sign_name, sign_exemple in signs.items():
+                if len(sign_exemple['value']):
+                    alive &= self.covered(sign_name, sign_exemple['value']).all(axis=0)
+                if not alive.any():
+                    return []
+        return [self.diseases[i] for i in np.flatnonzero(alive)]
+
+    def _flatMeasurements(self, examples) -> tuple[pd.Index, list[tuple[str, np.ndarray, np.ndarray]]]:
+        '''the patients and (sign name, values, patient number of every value) for every sign'''
+        if not isinstance(examples, dict):
+            examples = list(examples)
+            return pd.RangeIndex(len(examples), name='пациент'), self._flatExamples(examples)
+
+        batches = {None: examples} if _isDiseaseExemple(examples) else examples
+        if not isExamplesBatch(batches):
+            if None in batches:
+                raise TypeError('один пример DiseaseExemple - это diagnose, для diagnoseBatch нужен список примеров, '
+                                'пакет createExamples(n) или {заболевание: пример}')
+            # mkb.createExample(): an example of every disease
+            return pd.Index(list(batches), name='заболевание примера'), self._flatExamples(list(batches.values()))
+
+        # mkb.createExamples(n) or Disease.createExamples(n): the i-th example of every disease is a patient
+        values, patients, index, first = {}, {}, [], 0
+        for disease_name, batch in batches.items():
+            n = 0
+            for signs in batch.values():
+                for sign_name, sign_exemple in signs.items():
+                    offsets = np.asarray(sign_exemple['offsets'])
+                    n = len(offsets) - 1
+                    values.setdefault(sign_name, []).append(np.asarray(sign_exemple['value']))
+                    patients.setdefault(sign_name, []).append(first + np.repeat(np.arange(n), np.diff(offsets)))
+            index += [(disease_name, i) for i in range(n)]
+            first += n
+        if None in batches:
+            index = pd.RangeIndex(first, name='пациент')
+        else:
+            index = pd.MultiIndex.from_tuples(index, names=['заболевание примера', 'пациент'])
+        return index, [(sign_name, np.concatenate(values[sign_name]), np.concatenate(patients[sign_name]))
+                       for sign_name in values]
+
+    def _flatExamples(self, examples: list[dict]) -> list[tuple[str, np.ndarray, np.ndarray]]:
+        values, patients = {}, {}
+        for patient, example in enumerate(examples):
+            for signs in example.values():
+                for sign_name, sign_exemple in signs.items():
+                    values.setdefault(sign_name, []).extend(sign_exemple['value'])
+                    patients.setdefault(sign_name, []).extend([patient] * len(sign_exemple['value']))
+        return [(sign_name, np.asarray(values[sign_name]), np.array(patients[sign_name], dtype=np.int64))
+                for sign_name in values]
+
+    def diagnoseBatch(self, examples) -> pd.DataFrame:
+        '''examples: a list of DiseaseExemple, a batch of mkb.createExamples(n) or of 
+        Disease.createExamples(n), or mkb.createExample(); in a batch of mkb every 
+        example of every disease is a patient
+
+        Returns
+        ----------
+        pd.DataFrame (patients, diseases)
+            share of the patient's measurements the disease explains, 1 - consistent;
+            the patients of an mkb batch are indexed by (disease of the example, number)
+        '''
+        index, flat = self._flatMeasurements(examples)
+        n = len(index)
+        covered_count = np.zeros((n, len(self.diseases)), dtype=np.int64)
+        total         = np.zeros(n, dtype=np.int64)
+        for sign_name, values, patients in flat:
+            if not len(values):
+                continue
+            # the values go patient by patient, every patient's rows are summed at once
+            starts = np.flatnonzero(np.r_[True, patients[1:] != patients[:-1]])
+            covered_count[patients[starts]] += np.add.reduceat(self.covered(sign_name, values), starts,
+                                                               axis=0, dtype=np.int64)
+            total += np.bincount(patients, minlength=n)
+        score = np.divide(covered_count, total[:, None], out=np.ones(covered_count.shape), where=total[:, None] > 0)
+        return pd.DataFrame(score,
+                            index   = index,
+                            columns = pd.Index(self.diseases, name='заболевание'))
+
+
+if __name__ == '__main__':
+    import model_knowledge_base
+
+    def checkDiagnose(is_print: bool):
+        mkb = model_knowledge_base.ModelKnowledgeBase(disease_count=4, signs_count=6, seed=5)
+        mkb.generateSings(boundaries_value_exponent_cont=[2, 3])
+        mkb.generateDisease()
+        index = DiagnosisIndex.fromKnowledgeBase(mkb)
+
+        # the true disease always explains its own examples
+        examples = mkb.createExample()
+        for disease_name, example in examples.items():
+            ans = index.diagnose(example)
+            assert disease_name in ans, (disease_name, ans)
+            if is_print:
+                print(disease_name, '->', ans)
+
+        # the batch agrees with diagnose one by one
+        batch  = mkb.disease[0].createExamples(20)
+        scores = index.diagnoseBatch(batch)
+        assert (scores[mkb.disease[0].name] == 1).all()
+        scores_list = index.diagnoseBatch(list(examples.values()))
+        for i, example in enumerate(examples.values()):
+            assert list(scores_list.columns[scores_list.loc[i] == 1]) == index.diagnose(example)
+        # a batch of mkb: every example of every disease is a patient
+        examples_mkb = mkb.createExamples(5)
+        scores_mkb   = index.diagnoseBatch(examples_mkb)
+        assert len(scores_mkb) == 5 * len(mkb.disease)
+        for disease_name in examples_mkb:
+            assert (scores_mkb.loc[disease_name, disease_name] == 1).all()
+        assert np.array_equal(index.diagnoseBatch(examples).to_numpy(), scores_list.to_numpy())
+        if is_print:
+            print(scores_list)
+            print(scores_mkb)
+
+    checkDiagnose(True)
@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-import random
 
 import sign as sig
 from typing import TypedDict, Dict, Required
@@ -17,14 +16,17 @@ class PeriodsDynamic():
         at least period_time_min and no more than period_time_max
     time_period_boundaries: tuple[int, int]
         gap list [[period_0_time_min, period_0_time_max], [period_1_time_min, period_1_time_max], ...]
-        1 <= period <= 24
+        1 <= period <= 24, kept as np.int8, a Disease packs them of all its signs into one array
     '''
+    __slots__ = ('_boundaries', '_start', '_stop', '_rng')
+    
     def __init__(self,
                  period_time_boundaries: list[tuple[int, int]] | None = None,
                  *,
                  pd_count_max = 5,
-                 pd_len_max   = 25) -> None:
-        self._rng = np.random.default_rng()
+                 pd_len_max   = 25,
+                 rng: np.random.Generator | None = None) -> None:
+        self._rng = sig.sharedRng() if rng is None else rng
         if period_time_boundaries is None:
             pd_count_min = 2
             pd_len_range = range(1, pd_len_max)
@@ -42,7 +44,20 @@ class PeriodsDynamic():
             if not (1 <= period[0] < period[1] <= 24):
                 raise TypeError("что за фигню в ограничения period_time напихали?!?")
 
-        self.period_time_boundaries = np.array(period_time_boundaries)
+        self.period_time_boundaries = period_time_boundaries
+    
+    @property
+    def period_time_boundaries(self) -> np.ndarray:
+        return self._boundaries[self._start:self._stop]
+    
+    @period_time_boundaries.setter
+    def period_time_boundaries(self, period_time_boundaries) -> None:
+        self._boundaries = np.array(period_time_boundaries, dtype=np.int8)
+        self._start, self._stop = 0, len(self._boundaries)
+    
+    def _place(self, boundaries: np.ndarray, start: int) -> None:
+        '''keep the boundaries as rows start:start+pd_count of a bigger array, no array per object'''
+        self._boundaries, self._start, self._stop = boundaries, start, start + self._stop - self._start
         
         
     def __str__(self) -> str:
@@ -56,28 +71,28 @@ class PeriodsDynamic():
     
     @property
     def data_frame(self):
-        data = pd.DataFrame({'НГ': self.period_time_boundaries[:, 0],
-                             'ВГ': self.period_time_boundaries[:, 1]})
+        data = pd.DataFrame({'НГ': self.period_time_boundaries[:, 0].astype(np.int64),
+                             'ВГ': self.period_time_boundaries[:, 1].astype(np.int64)})
     
         return data
     
     @property
     def pd_count(self):
-        return len(self.period_time_boundaries)
+        return self._stop - self._start
         
     def createMeasurementTimes(self, *, count_mesurment_in_pd_max = 3):
-        period_count = len(self.period_time_boundaries)
+        boundaries   = self.period_time_boundaries
+        period_count = len(boundaries)
         
-        pd_times = np.array([random.randint(period_time[0], period_time[1]) 
-                             for period_time in self.period_time_boundaries])
+        pd_times = self._rng.integers(boundaries[:, 0], boundaries[:, 1] + 1)
         
         # it may turn out that for the selected duration of the dynamic period it is impossible to perform 3 measurements
         count_mesurment_in_pd_max_arr = np.where(pd_times > count_mesurment_in_pd_max, count_mesurment_in_pd_max, pd_times)
         # select the number of measurements for the period, taking into account the maximum possible
-        count_mesurment_in_pd_arr = [random.randint(1, max) for max in count_mesurment_in_pd_max_arr]
+        count_mesurment_in_pd_arr = self._rng.integers(1, count_mesurment_in_pd_max_arr + 1)
         
         # select the time for each measurement on the entire time axis grouped by periods of dynamics
-        measurement_times = [np.sort(random.sample(range(1, pd_times[i]+1), count_mesurment_in_pd_arr[i])) 
+        measurement_times = [np.sort(self._rng.permutation(pd_times[i])[:count_mesurment_in_pd_arr[i]] + 1) 
                              for i in range(period_count)]
         time_summary = 0
         for i, el in enumerate(measurement_times):
@@ -85,19 +100,108 @@ class PeriodsDynamic():
             
         return measurement_times
 
+    def createMeasurementTimesBatch(self, n: int, *, count_mesurment_in_pd_max = 3) -> tuple[np.ndarray, np.ndarray]:
+        '''measurement times of n examples at once, same rules as createMeasurementTimes
+        
+        Returns
+        ----------
+        times: np.ndarray (n, pd_count, count_mesurment_in_pd_max)
+            times on the entire time axis, in every period the used ones go first and are sorted
+        mask: np.ndarray (n, pd_count, count_mesurment_in_pd_max)
+            which of the times are used
+        '''
+        return sampleMeasurementTimes(self._rng, self.period_time_boundaries, n, count_mesurment_in_pd_max)
+
+
+def sampleMeasurementTimes(rng: np.random.Generator,
+                           period_time_boundaries: np.ndarray,
+                           n: int,
+                           count_mesurment_in_pd_max = 3,
+                           pd_starts: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    '''measurement times of n examples for many periods at once, see PeriodsDynamic.createMeasurementTimesBatch
+    
+    pd_starts: indexes of the periods that start a new time axis (the first periods of
+    every (disease, sign) pair), by default all the periods belong to one pair
+    '''
+    boundaries = np.asarray(period_time_boundaries, dtype=np.int64)
+    pd_count   = len(boundaries)
+    pd_times   = rng.integers(boundaries[:, 0], boundaries[:, 1] + 1, size=(n, pd_count))
+    counts     = rng.integers(1, np.minimum(pd_times, count_mesurment_in_pd_max) + 1)
+    
+    # j-th time is uniform over the pd_times - j unused ones: a number in [1, pd_times - j]
+    # is shifted past every smaller time that is already taken
+    times = np.zeros((n, pd_count, count_mesurment_in_pd_max), dtype=np.int64)
+    for j in range(count_mesurment_in_pd_max):
+        r = np.floor(rng.random((n, pd_count)) * np.maximum(pd_times - j, 1)).astype(np.int64) + 1
+        for prev in np.sort(times[:, :, :j], axis=2).transpose(2, 0, 1):
+            r += prev <= r
+        times[:, :, j] = r
+    
+    time_start = np.cumsum(pd_times, axis=1) - pd_times
+    if pd_starts is not None:
+        first = np.repeat(pd_starts, np.diff(np.append(pd_starts, pd_count)))
+        time_start -= time_start[:, first]
+    
+    mask  = np.arange(count_mesurment_in_pd_max) < counts[:, :, None]
+    times = np.sort(np.where(mask, times, np.iinfo(np.int64).max), axis=2)
+    times = np.where(mask, times, 0) + time_start[:, :, None]
+    return times, mask
+
+
+def sampleValuesContinuous(rng: np.random.Generator,
+                           zdp_min: np.ndarray,
+                           zdp_max: np.ndarray,
+                           decimal: int | np.ndarray,
+                           shape: tuple[int, int, int]) -> np.ndarray:
+    '''uniform values inside the ZDP of every period, shape is (n, periods, measurements)'''
+    values = rng.uniform(zdp_min[:, None], zdp_max[:, None], shape)
+    if np.ndim(decimal) == 0:
+        return np.around(values, decimal)
+    for dec in np.unique(decimal):
+        period = decimal == dec
+        values[:, period] = np.around(values[:, period], dec)
+    return values
+
+
+def sampleValuesDiscrete(rng: np.random.Generator,
+                         zdp_value_offsets: np.ndarray,
+                         zdp_values: np.ndarray,
+                         shape: tuple[int, int, int]) -> np.ndarray:
+    '''values drawn from the ZDP of every period, period i takes zdp_values[zdp_value_offsets[i]:zdp_value_offsets[i+1]]'''
+    lengths = np.diff(zdp_value_offsets)
+    index   = np.floor(rng.random(shape) * lengths[:, None]).astype(np.int64)
+    return zdp_values[zdp_value_offsets[:-1, None] + index]
+
 
 class SignOfDiseaseExemple(TypedDict):
     time:   list
     value:  list
 
+
+class SignOfDiseaseExemples(TypedDict):
+    '''n examples in flat arrays, example i is time[offsets[i]:offsets[i+1]]'''
+    time:    np.ndarray
+    value:   np.ndarray
+    offsets: np.ndarray
+
 class SignOfDisease():
+    __slots__ = ('sign', 'periods_dynamic', 'sign_for_pd', '_rng')
+    
     def __init__(self, 
                  sign: sig.Sign,
                  periods_dynamic: PeriodsDynamic,
-                 boundaries_len_sample_in_percent = [0.1, 0.5]) -> None:
-        self._rng = np.random.default_rng()
+                 boundaries_len_sample_in_percent = [0.1, 0.5],
+                 rng: np.random.Generator | None = None,
+                 sign_for_pd: list | None = None) -> None:
+        '''sign_for_pd: ZDP of every period if they are known, otherwise they are sampled'''
+        self._rng = sig.sharedRng() if rng is None else rng
         self.sign                       = sign
         self.periods_dynamic            = periods_dynamic
+        if sign_for_pd is not None:
+            if len(sign_for_pd) != self.periods_dynamic.pd_count:
+                raise TypeError(f'у признака "{self.sign.name}" {self.periods_dynamic.pd_count} ПД, а ЗДП {len(sign_for_pd)}')
+            self.sign_for_pd = list(sign_for_pd)
+            return
         sign_for_pd_prev = []
         self.sign_for_pd = []
         for i in range(len(self.periods_dynamic.period_time_boundaries)):
@@ -156,17 +260,16 @@ class SignOfDisease():
     
     @property
     def data_frame(self):
-        if type(self.sign) == sig.SignContinuous:
-            sfpd = np.around(self.sign_for_pd, self.sign.decimal)
-        else:
-            sfpd = self.sign_for_pd
-            for i in range(len(sfpd)):
-                sfpd[i] = np.sort(sfpd[i])
-
         temp_1 = pd.DataFrame({'ЧПД': [self.periods_dynamic.pd_count]})
-        temp_2 = pd.DataFrame({'ЗДП': list(sfpd)})
+        temp_2 = pd.DataFrame({'ЗДП': self.zdpRows()})
         return self.sign.data_frame.join(temp_1), self.periods_dynamic.data_frame.join(temp_2)
     
+    def zdpRows(self) -> list[np.ndarray]:
+        '''ZDP of every period as shown in data_frame: rounded bounds or sorted values'''
+        if type(self.sign) == sig.SignContinuous:
+            return list(np.around(self.sign_for_pd, self.sign.decimal))
+        return [np.sort(s_pd) for s_pd in self.sign_for_pd]
+    
     def createExample(self, *, count_mesurment_in_pd_max = 3) -> SignOfDiseaseExemple:
         
         moments_verification = self.periods_dynamic.createMeasurementTimes(count_mesurment_in_pd_max=count_mesurment_in_pd_max)
@@ -185,15 +288,69 @@ class SignOfDisease():
             i += j + 1
 
         return {'time': moments_arr,'value': exemples_arr}
+    
+    def createExamples(self, n: int, *, count_mesurment_in_pd_max = 3) -> SignOfDiseaseExemples:
+        times, mask = self.periods_dynamic.createMeasurementTimesBatch(n, count_mesurment_in_pd_max=count_mesurment_in_pd_max)
+        if type(self.sign) == sig.SignContinuous:
+            boundaries = np.array(self.sign_for_pd, dtype=np.float64)
+            values = sampleValuesContinuous(self._rng, boundaries[:, 0], boundaries[:, 1], self.sign.decimal, times.shape)
+        elif type(self.sign) == sig.SignDiscrete:
+            lengths = np.array([len(s_pd) for s_pd in self.sign_for_pd])
+            offsets = np.concatenate([[0], np.cumsum(lengths)])
+            values  = sampleValuesDiscrete(self._rng, offsets, np.concatenate(self.sign_for_pd), times.shape)
+        
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(mask.sum(axis=(1, 2)), out=offsets[1:])
+        return {'time': times[mask], 'value': values[mask], 'offsets': offsets}
 
 class DiseaseExemple(TypedDict):
     signs_discrete:    Dict[str, SignOfDiseaseExemple]
     signs_continuous:  Dict[str, SignOfDiseaseExemple]
 
+
+class DiseaseExemples(TypedDict):
+    signs_discrete:    Dict[str, SignOfDiseaseExemples]
+    signs_continuous:  Dict[str, SignOfDiseaseExemples]
+
+
+def _signExemples(examples: dict):
+    for disease_exemple in examples.values():
+        for signs in disease_exemple.values():
+            yield from signs.values()
+
+
+def isExamplesBatch(examples: dict) -> bool:
+    '''True for the output of createExamples(n), False for the output of createExample()'''
+    return any('offsets' in sign_exemple for sign_exemple in _signExemples(examples))
+
+
+def splitExamples(examples: dict[str, DiseaseExemples]):
+    '''the examples of a createExamples(n) batch one by one, in the format of createExample()'''
+    offsets = next((sign_exemple['offsets'] for sign_exemple in _signExemples(examples)), [0])
+    for i in range(len(offsets) - 1):
+        yield {disease_name: {ty: {sign_name: {key: sign_exemple[key][sign_exemple['offsets'][i]:
+                                                                      sign_exemple['offsets'][i + 1]].tolist()
+                                               for key in ('time', 'value')}
+                                   for sign_name, sign_exemple in signs.items()}
+                              for ty, signs in disease_exemple.items()}
+               for disease_name, disease_exemple in examples.items()}
+
+
 class Disease():
+    __slots__ = ('name', 'signs', '_data_frame')
+    
     def __init__(self, name, signs: list[SignOfDisease]) -> None:
         self.name = name
         self.signs = signs
+        self._data_frame = None
+        
+        # the period boundaries of all the signs in one array instead of a small array per sign
+        if len(signs) > 0:
+            boundaries = np.concatenate([sign.periods_dynamic.period_time_boundaries for sign in signs])
+            start = 0
+            for sign in signs:
+                sign.periods_dynamic._place(boundaries, start)
+                start += sign.periods_dynamic.pd_count
         
     def __str__(self) -> str:
         s = f'Боезнь: {self.name} \n'
@@ -205,24 +362,31 @@ class Disease():
     
     @property
     def data_frame(self):
-        data_disease = pd.DataFrame()
-        data_pd      = pd.DataFrame()
+        '''built once from column lists and cached, the frames must not be modified'''
+        if self._data_frame is not None:
+            return self._data_frame
+        
+        columns_disease = {'признак': [], 'тип': [], 'ВЗ': [], 'ЧПД': []}
+        columns_pd      = {'признак': [], 'номер ПД': [], 'НГ': [], 'ВГ': [], 'ЗДП': []}
         for sign in self.signs:
-            data_disease_temp = (sign.data_frame[0])
-            data_disease = pd.concat([data_disease, data_disease_temp], ignore_index=True)
-            
-            data_pd_temp = sign.data_frame[1]
-            data_pd_temp.insert(1, 'признак', [sign.sign.name for i in range(len(data_pd_temp.index))])
+            for key, val in sign.sign.dataRow().items():
+                columns_disease[key].append(val)
+            columns_disease['ЧПД'].append(sign.periods_dynamic.pd_count)
             
-            data_pd      = pd.concat([data_pd, data_pd_temp])
+            boundaries = sign.periods_dynamic.period_time_boundaries
+            columns_pd['признак']  += [sign.sign.name] * len(boundaries)
+            columns_pd['номер ПД'] += range(1, len(boundaries) + 1)
+            columns_pd['НГ']       += boundaries[:, 0].tolist()
+            columns_pd['ВГ']       += boundaries[:, 1].tolist()
+            columns_pd['ЗДП']      += sign.zdpRows()
         
-        data_disease = data_disease.set_index('признак')
-        # mult_ind = data_pd.index.values 
-        data_pd.index.name = 'номер ПД'
-        data_pd.index += 1
-        data_pd = data_pd.set_index(['признак', data_pd.index])
+        data_disease = pd.DataFrame(columns_disease).set_index('признак')
+        data_pd      = pd.DataFrame({key: columns_pd[key] for key in ['НГ', 'ВГ', 'ЗДП']},
+                                    index=pd.MultiIndex.from_arrays([columns_pd['признак'], columns_pd['номер ПД']],
+                                                                    names=['признак', 'номер ПД']))
 
-        return data_disease, data_pd
+        self._data_frame = data_disease, data_pd
+        return self._data_frame
 
     def createExample(self, *, count_mesurment_in_pd_max = 3) :
         example_disease = {'signs_discrete':{}, 'signs_continuous':{}}
@@ -233,6 +397,15 @@ class Disease():
 
         return example_disease
 
+    def createExamples(self, n: int, *, count_mesurment_in_pd_max = 3) -> DiseaseExemples:
+        examples_disease = {'signs_discrete':{}, 'signs_continuous':{}}
+        
+        for sign in self.signs:
+            ty = 'signs_discrete' if type(sign.sign) == sig.SignDiscrete else 'signs_continuous'
+            examples_disease[ty][sign.sign.name] = sign.createExamples(n, count_mesurment_in_pd_max=count_mesurment_in_pd_max)
+
+        return examples_disease
+
 # #######################################################################################
 
 
@@ -0,0 +1,170 @@
+import numpy as np
+
+
+class IntervalIndex():
+    '''static index of closed intervals [lo, hi] for containment and overlap queries
+
+    A centered interval tree kept in flat arrays. The tree is the implicit binary
+    search tree over the sorted distinct endpoints, a node is the index ``mid`` of its
+    center in them. An interval belongs to the highest node whose center it contains.
+    The intervals of the nodes are stored twice, sorted by (node, lo) and by (node, hi),
+    so the intervals of a node containing x are a prefix or a suffix of its run.
+    A query walks down the tree, O(log n + k); the bulk queries walk all their
+    values down together, one array operation per tree level.
+
+    Attributes
+    ----------
+    lo, hi: np.ndarray[float64] (intervals,)
+        the intervals, answers are indexes in them
+
+    Methods
+    ----------
+    stab(x)
+        intervals containing x
+    stabMany(values)
+        (value index, interval index) for every value and every interval containing it
+    overlap(a, b)
+        intervals intersecting [a, b]
+    overlapMany(a, b)
+        (query index, interval index) for every query [a[i], b[i]] and every interval intersecting it
+    '''
+    def __init__(self, lo, hi) -> None:
+        self.lo = np.asarray(lo, dtype=np.float64).reshape(-1)
+        self.hi = np.asarray(hi, dtype=np.float64).reshape(-1)
+        if self.lo.shape != self.hi.shape:
+            raise TypeError('у интервалов разное число начал и концов')
+        if np.any(self.lo > self.hi):
+            raise TypeError('начало интервала больше конца')
+
+        self._points = np.unique(np.concatenate([self.lo, self.hi]))
+        m        = len(self._points)
+        rank_lo  = np.searchsorted(self._points, self.lo)
+        rank_hi  = np.searchsorted(self._points, self.hi)
+
+        # every interval goes down from the root until the center of the node falls into it
+        node  = np.empty(len(self.lo), dtype=np.int64)
+        left  = np.zeros(len(self.lo), dtype=np.int64)
+        right = np.full(len(self.lo), m, dtype=np.int64)
+        going = np.arange(len(self.lo))
+        while len(going):
+            mid   = (left[going] + right[going]) // 2
+            to_left  = rank_hi[going] < mid
+            to_right = rank_lo[going] > mid
+            here     = ~(to_left | to_right)
+            node[going[here]] = mid[here]
+            right[going[to_left]] = mid[to_left]
+            left[going[to_right]] = mid[to_right] + 1
+            going = going[~here]
+
+        # keys node * (m + 1) + rank order the intervals by node, then by the endpoint
+        self._width  = m + 1
+        self._key_lo = node * self._width + rank_lo
+        self._key_hi = node * self._width + rank_hi
+        self._by_lo  = np.argsort(self._key_lo, kind='stable')
+        self._by_hi  = np.argsort(self._key_hi, kind='stable')
+        self._key_lo = self._key_lo[self._by_lo]
+        self._key_hi = self._key_hi[self._by_hi]
+        # run of the intervals of every node
+        self._node_start = np.searchsorted(self._key_lo, np.arange(m) * self._width)
+        self._node_stop  = np.searchsorted(self._key_lo, (np.arange(m) + 1) * self._width)
+        # the three orders of the intervals one after another: by (node, lo), by (node, hi)
+        # and by lo without the tree for overlap queries, a run is a slice of _orders
+        n = len(self.lo)
+        self._sorted_lo = np.sort(self.lo)
+        self._orders    = np.concatenate([self._by_lo, self._by_hi, np.argsort(self.lo, kind='stable')])
+        self._by_hi_at, self._sorted_lo_at = n, 2 * n
+
+    def __len__(self) -> int:
+        return len(self.lo)
+
+    def stabMany(self, values) -> tuple[np.ndarray, np.ndarray]:
+        values = np.asarray(values, dtype=np.float64).reshape(-1)
+        # x against the endpoints: lo <= x is rank_lo < below_or_at, hi >= x is rank_hi >= at_or_above
+        below_or_at = np.searchsorted(self._points, values, side='right')
+        at_or_above = np.searchsorted(self._points, values, side='left')
+
+        # NaN is neither left nor right of a center and no interval contains it
+        query  = np.flatnonzero(~np.isnan(values))
+        left   = np.zeros(len(query), dtype=np.int64)
+        right  = np.full(len(query), len(self._points), dtype=np.int64)
+        found  = []
+        while True:
+            going = left < right
+            query, left, right = query[going], left[going], right[going]
+            if not len(query):
+                break
+            mid    = (left + right) // 2
+            x      = values[query]
+            center = self._points[mid]
+            start, stop = self._node_start[mid], self._node_stop[mid]
+            # x left of the center: the intervals of the node with lo <= x, a prefix of the run by lo
+            is_left  = x < center
+            count    = np.searchsorted(self._key_lo, mid * self._width + below_or_at[query]) - start
+            found.append((query[is_left], start[is_left], count[is_left]))
+            # x right of the center: the ones with hi >= x, a suffix of the run by hi
+            is_right = x > center
+            first    = np.searchsorted(self._key_hi, mid * self._width + at_or_above[query])
+            found.append((query[is_right], self._by_hi_at + first[is_right], (stop - first)[is_right]))
+            # x is the center: the whole node, and the search stops
+            is_here  = ~(is_left | is_right)
+            found.append((query[is_here], start[is_here], (stop - start)[is_here]))
+
+            right = np.where(is_left, mid, np.where(is_here, left, right))
+            left  = np.where(is_right, mid + 1, left)
+        return self._expand(found)
+
+    def overlapMany(self, a, b) -> tuple[np.ndarray, np.ndarray]:
+        a = np.asarray(a, dtype=np.float64).reshape(-1)
+        b = np.asarray(b, dtype=np.float64).reshape(-1)
+        if a.shape != b.shape or np.any(a > b):
+            raise TypeError('неверные запросы [a, b]')
+        # a query with a NaN end intersects nothing
+        keep = np.flatnonzero(~(np.isnan(a) | np.isnan(b)))
+        a, b = a[keep], b[keep]
+        # the intervals containing a, and the ones starting in (a, b]
+        query, interval = self.stabMany(a)
+        start = np.searchsorted(self._sorted_lo, a, side='right')
+        stop  = np.searchsorted(self._sorted_lo, b, side='right')
+        query_2, interval_2 = self._expand([(np.arange(len(a)), self._sorted_lo_at + start, stop - start)])
+        return keep[np.concatenate([query, query_2])], np.concatenate([interval, interval_2])
+
+    def _expand(self, found: list[tuple]) -> tuple[np.ndarray, np.ndarray]:
+        '''runs (queries, starts in _orders, counts) as (query index, interval index) pairs'''
+        query = np.concatenate([np.zeros(0, dtype=np.int64), *(f[0] for f in found)])
+        start = np.concatenate([np.zeros(0, dtype=np.int64), *(f[1] for f in found)])
+        count = np.concatenate([np.zeros(0, dtype=np.int64), *(f[2] for f in found)])
+        # position of every answer inside its run
+        offset = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+        return np.repeat(query, count), self._orders[np.repeat(start, count) + offset]
+
+    def stab(self, x: float) -> np.ndarray:
+        return np.sort(self.stabMany([x])[1])
+
+    def overlap(self, a: float, b: float) -> np.ndarray:
+        return np.sort(self.overlapMany([a], [b])[1])
+
+
+if __name__ == '__main__':
+    def checkIntervalIndex(is_print: bool):
+        rng = np.random.default_rng(3)
+        for n in [0, 1, 7, 300]:
+            lo = np.around(rng.uniform(-10, 10, n), 1)
+            hi = lo + np.around(rng.exponential(2, n), 1) * (rng.random(n) > 0.1)
+            index  = IntervalIndex(lo, hi)
+            values = np.concatenate([np.around(rng.uniform(-12, 15, 200), 1), lo, hi])
+            query, interval = index.stabMany(values)
+            for i, x in enumerate(values):
+                assert np.array_equal(np.sort(interval[query == i]), np.flatnonzero((lo <= x) & (x <= hi)))
+            a = np.around(rng.uniform(-12, 15, 100), 1)
+            b = a + np.around(rng.exponential(3, 100), 1)
+            for i in range(len(a)):
+                assert np.array_equal(index.overlap(a[i], b[i]), np.flatnonzero((lo <= b[i]) & (a[i] <= hi)))
+            # NaN lies in no interval and a query with a NaN end intersects none
+            query_nan, _ = index.stabMany([np.nan, 0.0, np.nan])
+            assert not np.isin(query_nan, [0, 2]).any()
+            query_nan, _ = index.overlapMany([np.nan, -20.0, 0.0], [1.0, 20.0, np.nan])
+            assert np.all(query_nan == 1) and len(query_nan) == n
+            if is_print:
+                print(n, 'интервалов:', len(query), 'попаданий')
+
+    checkIntervalIndex(True)
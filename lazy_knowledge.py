@@ -0,0 +1,100 @@
+from typing import Callable, Iterator
+
+
+class _Pending():
+    def __repr__(self) -> str:
+        return '<не построено>'
+
+
+_PENDING = _Pending()
+
+
+class LazyIGKB(dict):
+    '''{PD count: candidates} whose lists are built on first access and then kept
+
+    Every key has its own source: a function of ``build`` returning an iterator
+    over the candidates of this PD count (``build=False`` may yield anything,
+    only the number of items counts). A source does not depend on other lazy
+    values, so reading a key runs one generator to the end and stores a plain list.
+    The keys are known from the start, iteration over the keys, len and ``in``
+    build nothing; items, values, get and comparisons build what they return.
+
+    Methods
+    ----------
+    isNonEmpty(count_pd)
+        is there a candidate with this PD count, stops at the first one
+    count(count_pd)
+        number of candidates, without building them if they are not built yet
+    isBuilt(count_pd)
+    materialize()
+        plain dict with every list built
+    '''
+    def __init__(self, sources: dict[str, Callable[[bool], Iterator]]) -> None:
+        super().__init__((key, _PENDING) for key in sources)
+        self._sources = dict(sources)
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if value is _PENDING:
+            value = list(self._sources.pop(key)(True))
+            super().__setitem__(key, value)
+        return value
+
+    def __setitem__(self, key, value) -> None:
+        self._sources.pop(key, None)
+        super().__setitem__(key, value)
+
+    def isBuilt(self, count_pd: str) -> bool:
+        return super().__getitem__(count_pd) is not _PENDING
+
+    def isNonEmpty(self, count_pd: str) -> bool:
+        if self.isBuilt(count_pd):
+            return len(super().__getitem__(count_pd)) > 0
+        return next(iter(self._sources[count_pd](False)), _PENDING) is not _PENDING
+
+    def count(self, count_pd: str) -> int:
+        if self.isBuilt(count_pd):
+            return len(super().__getitem__(count_pd))
+        return sum(1 for _ in self._sources[count_pd](False))
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def materialize(self) -> dict:
+        return dict(self.items())
+
+    def __eq__(self, other) -> bool:
+        return self.materialize() == other
+
+    def __ne__(self, other) -> bool:
+        return not self == other
+
+    def __repr__(self) -> str:
+        return f'LazyIGKB({dict.__repr__(self)})'
+
+    def __reduce__(self):
+        # the sources are closures, a copy or a pickle is a plain dict
+        return dict, (self.materialize(),)
+
+    def __copy__(self):
+        return self.materialize()
+
+
+def isNonEmpty(igkb: dict, count_pd: str) -> bool:
+    '''has igkb candidates with this PD count, for a LazyIGKB without building them'''
+    if isinstance(igkb, LazyIGKB):
+        return igkb.isNonEmpty(count_pd)
+    return len(igkb.get(count_pd, ())) > 0
+
+
+def countCandidates(igkb: dict, count_pd: str) -> int:
+    '''number of candidates of igkb with this PD count, for a LazyIGKB without building them'''
+    if isinstance(igkb, LazyIGKB):
+        return igkb.count(count_pd)
+    return len(igkb.get(count_pd, ()))
@@ -5,6 +5,7 @@ import numpy as np
 import pandas as pd
 import disease as dis
 import sign as sig
+import diagnosis
 from typing import TypedDict
 
 
@@ -18,19 +19,59 @@ class ModelKnowledgeBase():
     disease_count: int
     signs_count: int
     sings_discrete_part: float
+    seed: int | np.random.SeedSequence | None
+        the same seed gives the same signs, diseases and examples
+    rng: np.random.Generator | None
+        alternative to seed, the seed sequence is drawn from it
 
     ----------
     createValue()
         requires redefinition is used to create an arbitrary attribute value
     '''
     
-    def __init__(self,  disease_count: int = 2, signs_count: int = 6) -> None:
+    def __init__(self,  
+                 disease_count: int = 2, 
+                 signs_count: int = 6,
+                 *,
+                 seed: int | np.random.SeedSequence | None = None,
+                 rng: np.random.Generator | None = None) -> None:
         self._disease_count   = disease_count
         self._signs_count     = signs_count
         self._sings_discrete  = []
         self._signs_continous = []
         self.disease          = None
-        self._rng             = np.random.default_rng()
+        self._data_frame      = None
+        self._diagnosis_index = None
+        
+        if rng is not None:
+            seed = np.random.SeedSequence(rng.integers(0, 2**63, size=4))
+        elif not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self._seed_sequence = seed
+        # one child stream per kind of object, the objects of a kind share it
+        self._rng, rng_signs, rng_periods, rng_sign_of_disease = \
+            [np.random.default_rng(s) for s in self._seed_sequence.spawn(4)]
+        self._streams = {'signs':           rng_signs,
+                         'periods':         rng_periods,
+                         'sign_of_disease': rng_sign_of_disease}
+    
+    def save(self, path: str) -> None:
+        '''binary columns of the base in the directory path, see ColumnarKnowledgeBase.save'''
+        # columnar_knowledge_base imports this module
+        import columnar_knowledge_base
+        columnar_knowledge_base.ColumnarKnowledgeBase.fromModel(self).save(path)
+    
+    @classmethod
+    def load(cls, path: str, *, seed: int | np.random.SeedSequence | None = None):
+        '''a base written by save() with all its objects built, O(pairs) time and memory;
+        ColumnarKnowledgeBase.load(path) memory-maps the columns and only reads the header'''
+        import columnar_knowledge_base
+        ckb = columnar_knowledge_base.ColumnarKnowledgeBase.load(path, mmap=False, rng=np.random.default_rng(seed))
+        return ckb.toModel()
+    
+    def spawnRng(self) -> np.random.Generator:
+        '''a new independent stream derived from the seed, e.g. for a training model'''
+        return np.random.default_rng(self._seed_sequence.spawn(1)[0])
     
     @property
     def signs(self):
@@ -38,29 +79,55 @@ class ModelKnowledgeBase():
 
     @property
     def data_frame(self) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]: 
-        data_signs : pd.DataFrame = self.disease[0].data_frame[0]
-        data_signs  = data_signs.loc[:, data_signs.columns != 'ЧПД']
+        '''signs, ЧПД of every (disease, sign) and periods of dynamics
+        
+        Built in one pass from column lists and cached until generateSings or 
+        generateDisease runs again, the frames must not be modified.
+        '''
+        if self._data_frame is not None:
+            return self._data_frame
+        
+        columns_signs = {'признак': [], 'тип': [], 'ВЗ': []}
+        for sign in self.signs:
+            for key, val in sign.dataRow().items():
+                columns_signs[key].append(val)
+        data_signs = pd.DataFrame(columns_signs).set_index('признак')
         
-        data_disease    = pd.DataFrame()
-        data_pd         = pd.DataFrame()
+        count_pd   = []
+        columns_pd = {'заболевание': [], 'признак': [], 'номер ПД': [], 'НГ': [], 'ВГ': [], 'ЗДП': []}
         for d in self.disease:
-            data_disease_temp = d.data_frame[0].loc[:, ['ЧПД']]
-            data_disease_temp = data_disease_temp.T
-            data_disease_temp.index = [f'{d.name}']
-            data_disease = pd.concat([data_disease, data_disease_temp])
-            
-            data_pd_temp = d.data_frame[1]
-            data_pd_temp.insert(0, 'заболевание', [d.name for _ in range(len(data_pd_temp.index))])
-            data_pd = pd.concat([data_pd, data_pd_temp])
+            count_pd.append([sign.periods_dynamic.pd_count for sign in d.signs])
+            for sign in d.signs:
+                boundaries = sign.periods_dynamic.period_time_boundaries
+                columns_pd['заболевание'] += [d.name] * len(boundaries)
+                columns_pd['признак']     += [sign.sign.name] * len(boundaries)
+                columns_pd['номер ПД']    += range(1, len(boundaries) + 1)
+                columns_pd['НГ']          += boundaries[:, 0].tolist()
+                columns_pd['ВГ']          += boundaries[:, 1].tolist()
+                columns_pd['ЗДП']         += sign.zdpRows()
         
-        data_pd      = data_pd.set_index(['заболевание', data_pd.index])
-        data_disease.index.name = 'заболевание'
+        data_disease = pd.DataFrame(np.array(count_pd, dtype=np.int64).reshape(len(self.disease), -1),
+                                    index   = pd.Index([f'{d.name}' for d in self.disease], name='заболевание'),
+                                    columns = pd.Index([sign.sign.name for sign in self.disease[0].signs], name='признак'))
         
-        # index = pd.MultiIndex.from_tuples((['ЧПД для признака' for _ in range(len(data_disease.columns))],
-        #                                   data_disease.columns))
-        # data_disease.columns = index
+        index   = [columns_pd[key] for key in ['заболевание', 'признак', 'номер ПД']]
+        data_pd = pd.DataFrame({key: columns_pd[key] for key in ['НГ', 'ВГ', 'ЗДП']},
+                               index=pd.MultiIndex.from_arrays(index, names=['заболевание', 'признак', 'номер ПД']))
         
-        return data_signs, data_disease, data_pd
+        self._data_frame = data_signs, data_disease, data_pd
+        return self._data_frame
+    
+    def diagnose(self, example: dict) -> list[str]:
+        '''diseases whose true ZDP are consistent with the DiseaseExemple of a patient, see diagnosis.DiagnosisIndex'''
+        if self._diagnosis_index is None:
+            self._diagnosis_index = diagnosis.DiagnosisIndex.fromKnowledgeBase(self)
+        return self._diagnosis_index.diagnose(example)
+    
+    def diagnoseBatch(self, examples) -> pd.DataFrame:
+        '''share of every patient's measurements every disease explains, see DiagnosisIndex.diagnoseBatch'''
+        if self._diagnosis_index is None:
+            self._diagnosis_index = diagnosis.DiagnosisIndex.fromKnowledgeBase(self)
+        return self._diagnosis_index.diagnoseBatch(examples)
     
     def generateSings(self,
                       part_discr_cont:                float               = 0.5,
@@ -68,6 +135,8 @@ class ModelKnowledgeBase():
                       boundaries_value_mean_cont:     tuple[float, float] = [-10, 10],
                       boundaries_value_exponent_cont: tuple[float, float] = [-4, 2]):
         
+        self._data_frame        = None
+        self._diagnosis_index   = None
         sings_discrete_count    = int(self._signs_count * part_discr_cont)
         signs_continous_count   = self._signs_count - sings_discrete_count
         
@@ -79,7 +148,8 @@ class ModelKnowledgeBase():
         
         self._sings_discrete = [sig.SignDiscrete(name = f'дискретный {i+1}',
                                        possible_value = list(range(self._rng.integers(2,  count_value_max_discr+1))),
-                                         normal_value = 0) 
+                                         normal_value = 0,
+                                                  rng = self._streams['signs']) 
                                for i in range(sings_discrete_count)]
 
         val_mean = self._rng.random(size=signs_continous_count) * (boundaries_value_mean_cont[1] - boundaries_value_mean_cont[0]) \
@@ -96,18 +166,22 @@ class ModelKnowledgeBase():
         self._signs_continous = [sig.SignContinuous(name = f'непрерывный {i+1}',
                                                  val_min = val_bound[0],
                                                  val_max = val_bound[1],
-                                            normal_value = (val_bound[0] + val_bound[1])/2) 
+                                            normal_value = (val_bound[0] + val_bound[1])/2,
+                                                     rng = self._streams['signs']) 
                                for i, val_bound in enumerate(zip(val_min, val_max))]
         
     def generateDisease(self, *, pd_count_max = 5, pd_len_max = 25) -> dict:
         if len(self.signs) < self._signs_count:
             self.generateSings()
+        self._data_frame = None
+        self._diagnosis_index = None
         periods_dynamics = np.array([[dis.PeriodsDynamic(pd_count_max = pd_count_max,
-                                                           pd_len_max = pd_len_max) 
+                                                           pd_len_max = pd_len_max,
+                                                                  rng = self._streams['periods']) 
                                         for _ in range(self._signs_count)] 
                                             for _ in range(self._disease_count)])
         
-        sign_of_disease = np.array([[dis.SignOfDisease(sign=sign, periods_dynamic=per_d) 
+        sign_of_disease = np.array([[dis.SignOfDisease(sign=sign, periods_dynamic=per_d, rng=self._streams['sign_of_disease']) 
                                         for sign, per_d in zip(self.signs, periods_dynamic)] 
                                             for periods_dynamic in periods_dynamics])
         
@@ -123,6 +197,13 @@ class ModelKnowledgeBase():
         
         return exemple_disease_arr            
 
+    def createExamples(self, n: int, *, count_mesurment_in_pd_max = 3) -> dict[str, dis.DiseaseExemples]:
+        '''n examples of every disease at once in flat arrays, see disease.SignOfDiseaseExemples'''
+        if self.disease is None:
+            self.generateDisease()
+        return {f'{d.name}': d.createExamples(n, count_mesurment_in_pd_max=count_mesurment_in_pd_max) 
+                for d in self.disease}
+
 
 if __name__ == '__main__':
     def checClinicalPicture(is_print: bool):
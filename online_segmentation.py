@@ -0,0 +1,113 @@
+class OnlineSegmentation():
+    '''findePosiblePD for an example whose measurements arrive one at a time
+
+    Keeps the frontier: every valid segmentation of the measurements so far into
+    at most count_pd_max segments, the last segment left open. A new measurement
+    either extends the open segment of a state or closes it and opens a new one,
+    so append costs O(frontier) and does not look at the history. A state whose
+    open segment intersects the previous segment is dropped for good: the segment
+    only grows, so it would intersect it with every later measurement too.
+
+    Attributes
+    ----------
+    sign_type: str
+        'discrete' or 'continuous'
+    count_pd_max: int
+    value_bits: dict | None
+        for discrete signs store ZDP as bit masks with these bit numbers, otherwise as sets
+    length: int
+        measurements appended so far
+
+    Methods
+    ----------
+    append(time, value)
+        adds one measurement
+    extend(times, values)
+        adds measurements one by one
+    result()
+        candidates of the measurements so far, same as findePosiblePD of the whole example
+    '''
+    def __init__(self, sign_type: str, count_pd_max: int, value_bits: dict | None = None) -> None:
+        if not (sign_type in ['discrete', 'continuous']):
+            raise TypeError(f'{sign_type} not SignType')
+        self.sign_type    = sign_type
+        self.count_pd_max = count_pd_max
+        self.value_bits   = value_bits
+        self.length       = 0
+        self._last_time   = None
+        # state: (delimiters, closed ZDP, closed durations, open segment, time of its first measurement)
+        self._frontier    = []
+
+    @property
+    def frontier_size(self) -> int:
+        return len(self._frontier)
+
+    def _point(self, value):
+        if self.sign_type == 'continuous':
+            return value, value
+        if self.value_bits is not None:
+            return 1 << self.value_bits[value]
+        return {value}
+
+    def _extend(self, segment, value):
+        '''the segment with one more value and True if the value is already in it'''
+        if self.sign_type == 'continuous':
+            val_min, val_max = segment
+            if val_min <= value <= val_max:
+                return segment, True
+            return (min(val_min, value), max(val_max, value)), False
+        if self.value_bits is not None:
+            bit = 1 << self.value_bits[value]
+            return segment | bit, segment & bit != 0
+        if value in segment:
+            return segment, True
+        # a new set, the old one may be a closed segment of another state
+        return segment | {value}, False
+
+    def _contains(self, segment, value) -> bool:
+        if self.sign_type == 'continuous':
+            return segment[0] <= value <= segment[1]
+        if self.value_bits is not None:
+            return segment >> self.value_bits[value] & 1 == 1
+        return value in segment
+
+    def _intersects(self, prev, segment) -> bool:
+        if self.sign_type == 'continuous':
+            return not (prev[1] < segment[0] or segment[1] < prev[0])
+        return bool(prev & segment)
+
+    def append(self, time, value):
+        if self.value_bits is not None and value not in self.value_bits:
+            raise TypeError(f'значения "{value}" нет среди value_bits {list(self.value_bits)}')
+        if self.length == 0:
+            self._frontier = [((), (), (), self._point(value), time)]
+        else:
+            frontier   = []
+            split_time = self._last_time
+            for delimiters, zdp, pd_duration, segment, start_time in self._frontier:
+                extended, unchanged = self._extend(segment, value)
+                # the open segment grows: it stays valid if the new value does not hit the previous segment
+                if not zdp or unchanged or not self._intersects(zdp[-1], extended):
+                    frontier.append((delimiters, zdp, pd_duration, extended, start_time))
+                # or it is closed before the new value, which opens a new segment
+                if len(zdp) + 1 < self.count_pd_max and not self._contains(segment, value):
+                    frontier.append(((*delimiters, self.length),
+                                     (*zdp, segment),
+                                     (*pd_duration, (start_time, split_time)),
+                                     self._point(value),
+                                     time))
+            self._frontier = frontier
+        self.length    += 1
+        self._last_time = time
+
+    def extend(self, times, values):
+        for time, value in zip(times, values):
+            self.append(time, value)
+
+    def result(self) -> dict[str, list]:
+        '''{PD count: candidates} in the order of findePosiblePD (lexicographic by delimiters)'''
+        igkb = {f'{pd_count+1}': [] for pd_count in range(self.count_pd_max)}
+        for delimiters, zdp, pd_duration, segment, start_time in sorted(self._frontier, key=lambda state: state[0]):
+            igkb[f'{len(zdp)+1}'].append({'zdp':         [*zdp, segment],
+                                          'pd_duration': [*pd_duration, (start_time, self._last_time)]})
+        return igkb
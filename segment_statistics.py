@@ -0,0 +1,124 @@
+import operator
+
+
+class SegmentStatistics():
+    '''precomputed statistics of one example's value array
+
+    Answers queries about a segment ``values[start:end]`` without looking
+    at its elements: min and max come from sparse tables of indexes in O(1),
+    the set of discrete values comes from a sparse table of bit masks in O(1).
+
+    Attributes
+    ----------
+    values: list
+        the example's measurements, never copied
+    sign_type: str
+        'discrete' or 'continuous'
+    value_bits: dict
+        bit number for every discrete value, built from ``values`` if not given
+
+    Methods
+    ----------
+    bounds(start, end)
+        (min, max) of a continuous segment
+    mask(start, end)
+        bit mask of the values of a discrete segment
+    valueSet(start, end)
+        set of the values of a discrete segment
+    isIntersect(prev_start, start, end)
+        do the neighboring segments [prev_start, start) and [start, end) intersect
+    firstIntersectingEnd(prev_start, start)
+        the smallest end for which the neighboring segments intersect
+    '''
+    def __init__(self, values: list, sign_type: str, value_bits: dict | None = None) -> None:
+        if not (sign_type in ['discrete', 'continuous']):
+            raise TypeError(f'{sign_type} not SignType')
+        self.values    = values
+        self.sign_type = sign_type
+        self.length    = len(values)
+
+        if sign_type == 'continuous':
+            self._arg_min = self._createArgTable(operator.lt)
+            self._arg_max = self._createArgTable(operator.gt)
+        else:
+            if value_bits is None:
+                value_bits = {}
+                for val in values:
+                    value_bits.setdefault(val, len(value_bits))
+            self.value_bits  = value_bits
+            self._bit_values = {bit: val for val, bit in value_bits.items()}
+            self._masks      = self._createMaskTable()
+
+    def _createArgTable(self, better) -> list[list[int]]:
+        values = self.values
+        level  = list(range(self.length))
+        table  = [level]
+        width  = 1
+        while 2 * width <= self.length:
+            level = [b if better(values[b], values[a]) else a for a, b in zip(level, level[width:])]
+            table.append(level)
+            width *= 2
+        return table
+
+    def _createMaskTable(self) -> list[list[int]]:
+        level = [1 << self.value_bits[val] for val in self.values]
+        table = [level]
+        width = 1
+        while 2 * width <= self.length:
+            level = [a | b for a, b in zip(level, level[width:])]
+            table.append(level)
+            width *= 2
+        return table
+
+    def bounds(self, start: int, end: int) -> tuple:
+        j = (end - start).bit_length() - 1
+        i_min = self._arg_min[j][start], self._arg_min[j][end - (1 << j)]
+        i_max = self._arg_max[j][start], self._arg_max[j][end - (1 << j)]
+        val_min = min(self.values[i_min[0]], self.values[i_min[1]])
+        val_max = max(self.values[i_max[0]], self.values[i_max[1]])
+        return val_min, val_max
+
+    def mask(self, start: int, end: int) -> int:
+        j = (end - start).bit_length() - 1
+        return self._masks[j][start] | self._masks[j][end - (1 << j)]
+
+    def valueSet(self, start: int, end: int) -> set:
+        return self.decodeMask(self.mask(start, end))
+
+    def decodeMask(self, mask: int) -> set:
+        ans = set()
+        while mask:
+            low = mask & -mask
+            ans.add(self._bit_values[low.bit_length() - 1])
+            mask ^= low
+        return ans
+
+    def isIntersect(self, prev_start: int, start: int, end: int) -> bool:
+        if self.sign_type == 'discrete':
+            return (self.mask(prev_start, start) & self.mask(start, end)) != 0
+        prev = self.bounds(prev_start, start)
+        cur  = self.bounds(start, end)
+        return not (prev[1] < cur[0] or cur[1] < prev[0])
+
+    def firstIntersectingEnd(self, prev_start: int, start: int) -> int:
+        '''segments only grow with ``end``, so a binary search is enough;
+        returns ``length + 1`` if even the longest segment does not intersect'''
+        lo, hi = start + 1, self.length + 1
+        if self.sign_type == 'discrete':
+            prev_mask = self.mask(prev_start, start)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if prev_mask & self.mask(start, mid):
+                    hi = mid
+                else:
+                    lo = mid + 1
+        else:
+            prev_min, prev_max = self.bounds(prev_start, start)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                cur_min, cur_max = self.bounds(start, mid)
+                if not (prev_max < cur_min or cur_max < prev_min):
+                    hi = mid
+                else:
+                    lo = mid + 1
+        return lo
@@ -2,6 +2,15 @@ import pandas as pd
 import numpy as np
 
 
+# objects created without rng share this generator instead of owning one each
+_shared_rng = np.random.default_rng()
+
+
+def sharedRng() -> np.random.Generator:
+    '''the generator of the objects created without rng'''
+    return _shared_rng
+
+
 class Sign():
     '''measurable characteristic for a person
     
@@ -11,31 +20,39 @@ class Sign():
         parameter name must be unique
     normal_value
         the most common trait value for a normal person
+    rng: np.random.Generator | None
+        random stream for createSample, may be shared by many signs, sharedRng() if not given
     
     Methods
     ----------
     createValue()
         requires redefinition is used to create an arbitrary attribute value
     '''
-    def __init__(self, name: str, normal_value, possible_value) -> None:
-        self._rng = np.random.default_rng()
+    __slots__ = ('name', 'possible_value', 'normal_value', '_rng')
+    
+    def __init__(self, name: str, normal_value, possible_value, rng: np.random.Generator | None = None) -> None:
+        self._rng = _shared_rng if rng is None else rng
         self.name           = name
         self.possible_value = possible_value
         self.normal_value   = normal_value
     
     @property
     def data_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({key: [val] for key, val in self.dataRow().items()})
+
+    def dataRow(self) -> dict:
+        '''the single row of data_frame as a dict, for building big tables column by column'''
         if type(self) == SignDiscrete:
-            values = [' '.join(map(str, self.possible_value))]
+            values = ' '.join(map(str, self.possible_value))
         elif type(self) == SignContinuous:
             values = f'[{np.around(self.val_min, self.decimal)}, {np.around(self.val_max, self.decimal)}]'
             
-        t = ['Дискретный'] if type(self) == SignDiscrete \
-                                     else ['Непрерывный']
-        return pd.DataFrame({'признак'  : self.name,
-                             'тип'      : t,
-                             'ВЗ'       : values,
-                             })
+        t = 'Дискретный' if type(self) == SignDiscrete \
+                         else 'Непрерывный'
+        return {'признак'  : self.name,
+                'тип'      : t,
+                'ВЗ'       : values,
+                }
 
     def createSample(self, exeptions:list = [], boundaries_len_sample_in_percent: tuple[float, float] = [0.1, 0.5]):
         pass
@@ -51,11 +68,32 @@ class SignDiscrete(Sign):
     possible_value: list
     normal_value: possible_value[i]
         the most common trait value for a normal person
+    value_bits: dict
+        value -> bit number, a set of values is encoded as an int bit mask
     '''
-    def __init__(self, name, possible_value: list, normal_value=None) -> None:
+    __slots__ = ()
+    
+    def __init__(self, name, possible_value: list, normal_value=None, rng: np.random.Generator | None = None) -> None:
         if normal_value is None:
             normal_value = possible_value[0]
-        super().__init__(name, normal_value, possible_value)
+        super().__init__(name, normal_value, possible_value, rng)
+    
+    @property
+    def value_bits(self) -> dict:
+        '''bit number of every possible value for the bit mask encoding of value sets'''
+        return {val: i for i, val in enumerate(self.possible_value)}
+    
+    def encodeValues(self, values) -> int:
+        value_bits = self.value_bits
+        mask = 0
+        for val in values:
+            if val not in value_bits:
+                raise TypeError(f'вообщето y признака "{self.name}" значения "{val}" нет...')
+            mask |= 1 << value_bits[val]
+        return mask
+    
+    def decodeMask(self, mask: int) -> set:
+        return {val for i, val in enumerate(self.possible_value) if mask >> i & 1}
     
     def __str__(self) -> str:
         s = f'признак: "{self.name}" \n\t Возможные значения (ВЗ):' +\
@@ -104,14 +142,16 @@ class SignContinuous(Sign):
     normal_value
         the most common trait value for a normal person
     '''
-    def __init__(self, name: str, val_min: float, val_max: float, normal_value = None) -> None:
+    __slots__ = ('decimal',)
+    
+    def __init__(self, name: str, val_min: float, val_max: float, normal_value = None, rng: np.random.Generator | None = None) -> None:
         d = val_max - val_min
         self.decimal = -int(f'{d:e}'.split('e')[1]) + 2
         val_min = np.around(val_min, self.decimal)
         val_max = np.around(val_max, self.decimal)
         if normal_value is None:
             normal_value = np.mean([val_min, val_max])
-        super().__init__(name, normal_value, [val_min, val_max])
+        super().__init__(name, normal_value, [val_min, val_max], rng)
 
     
     @property
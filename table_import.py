@@ -0,0 +1,267 @@
+import csv
+import json
+import os
+import time
+
+import numpy as np
+
+from columnar_knowledge_base import ColumnarKnowledgeBase, decimalExponent
+
+
+COLUMNS = ('заболевание', 'признак', 'номер ПД', 'НГ', 'ВГ', 'ЗДП')
+SIGN_PREFIXES = {'дискретный': True, 'непрерывный': False}
+
+
+def parseZDP(zdp) -> list:
+    '''tokens of a ZDP cell without eval: "[10, 0, 5]", "[2.204 2.89 ]" or a JSON list'''
+    if isinstance(zdp, list):
+        return zdp
+    return zdp.strip().strip('[]').replace(',', ' ').split()
+
+
+def isDiscrete(sign_name: str, zdp: list) -> bool:
+    '''the type of a sign by the prefix of its name, otherwise discrete if all the ZDP values are integers'''
+    for prefix, is_discrete in SIGN_PREFIXES.items():
+        if sign_name.startswith(prefix):
+            return is_discrete
+    for val in zdp:
+        if isinstance(val, str):
+            try:
+                int(val)
+            except ValueError:
+                return False
+        elif not isinstance(val, int):
+            return False
+    return True
+
+
+def iterTableChunks(path: str, chunk_size: int = 1 << 16):
+    '''rows (заболевание, признак, номер ПД, НГ, ВГ, ЗДП) of a CSV or JSONL table, chunk_size rows at a time
+
+    The format is taken from the extension: .jsonl/.json is one object per line, anything else is CSV
+    with the header of COLUMNS.
+    '''
+    with open(path, encoding='utf-8', newline='') as f:
+        if os.path.splitext(path)[1] in ('.jsonl', '.json'):
+            rows = (tuple(row[key] for key in COLUMNS) for row in map(json.loads, f) if row)
+        else:
+            rows = csv.reader(f)
+            header = tuple(next(rows, ()))
+            if header != COLUMNS:
+                raise TypeError(f'в {path} столбцы {header}, а нужны {COLUMNS}')
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class TableImporter():
+    '''builds a ColumnarKnowledgeBase from table rows chunk by chunk
+
+    Every chunk is parsed into arrays right away, so the text of the table is never kept.
+    The rows may come in any order: the periods are put in place by one sort in result().
+    The table has no ВЗ of the signs, they are taken from the ZDP: the possible values of a
+    discrete sign are all its ZDP values, the bounds of a continuous one are the outermost ZDP bounds.
+
+    Attributes
+    ----------
+    rows: int
+        rows added so far
+    seconds: float
+        time spent in addRows and result
+
+    Methods
+    ----------
+    addRows(rows)
+        parses a chunk of rows (заболевание, признак, номер ПД, НГ, ВГ, ЗДП)
+    result(rng=None)
+        ColumnarKnowledgeBase of all the added rows, a missing (disease, sign) pair gets 0 periods
+    '''
+    def __init__(self) -> None:
+        self.rows    = 0
+        self.seconds = 0.0
+        self._diseases         = {}
+        self._signs            = {}
+        self._sign_is_discrete = []
+        self._chunks           = []
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+    def addRows(self, rows: list[tuple]) -> None:
+        start = time.perf_counter()
+        diseases, signs, sign_is_discrete = self._diseases, self._signs, self._sign_is_discrete
+
+        disease_index, sign_index, zdp_lengths, values_discr, values_cont = [], [], [], [], []
+        for disease, sign, _, _, _, zdp in rows:
+            zdp = parseZDP(zdp)
+            i = diseases.setdefault(disease, len(diseases))
+            j = signs.get(sign)
+            if j is None:
+                j = signs[sign] = len(signs)
+                sign_is_discrete.append(isDiscrete(sign, zdp))
+            disease_index.append(i)
+            sign_index.append(j)
+            if sign_is_discrete[j]:
+                zdp_lengths.append(len(zdp))
+                values_discr += zdp
+            else:
+                if len(zdp) != 2:
+                    raise TypeError(f'у непрерывного признака "{sign}" ЗДП {zdp}')
+                zdp_lengths.append(0)
+                values_cont += zdp
+
+        count = len(rows)
+        try:
+            values_discr = np.array(values_discr, dtype=np.int64)
+        except ValueError:
+            values_discr = np.array([str(val).strip('\'"') for val in values_discr])
+        values_cont = np.array(values_cont, dtype=np.float64).reshape(-1, 2)
+
+        self._chunks.append({'disease':  np.array(disease_index, dtype=np.int64),
+                             'sign':     np.array(sign_index, dtype=np.int64),
+                             'number':   np.fromiter((int(row[2]) for row in rows), np.int64, count),
+                             'lo':       np.fromiter((int(row[3]) for row in rows), np.int64, count),
+                             'hi':       np.fromiter((int(row[4]) for row in rows), np.int64, count),
+                             'lengths':  np.array(zdp_lengths, dtype=np.int64),
+                             'values':   values_discr,
+                             'zdp_cont': values_cont})
+        self.rows    += count
+        self.seconds += time.perf_counter() - start
+
+    def _column(self, key: str) -> np.ndarray:
+        columns = [chunk[key] for chunk in self._chunks]
+        if key == 'values' and any(column.dtype.kind == 'U' for column in columns):
+            columns = [column.astype(str) for column in columns]
+        return np.concatenate(columns) if columns else np.zeros(0, dtype=np.int64)
+
+    def result(self, rng: np.random.Generator | None = None) -> ColumnarKnowledgeBase:
+        start = time.perf_counter()
+        disease_count, signs_count = len(self._diseases), len(self._signs)
+        sign_is_discrete = np.array(self._sign_is_discrete, dtype=bool)
+
+        disease, sign, number = self._column('disease'), self._column('sign'), self._column('number')
+        lo, hi                = self._column('lo'), self._column('hi')
+        lengths, values       = self._column('lengths'), self._column('values')
+        zdp_cont              = self._column('zdp_cont').reshape(-1, 2)
+        if not np.all((1 <= lo) & (lo < hi) & (hi <= 24)):
+            raise TypeError("что за фигню в ограничения period_time напихали?!?")
+
+        # periods of a pair one after another, in the order of their numbers
+        pair  = disease * signs_count + sign
+        order = np.lexsort((number, pair))
+        pair, number = pair[order], number[order]
+        if np.any((pair[1:] == pair[:-1]) & (number[1:] == number[:-1])):
+            raise TypeError('в таблице повторяется номер ПД')
+        pd_count = np.bincount(pair, minlength=disease_count * signs_count)
+        if pd_count.max(initial=0) > np.iinfo(np.int8).max:
+            raise TypeError('слишком много ПД у одного признака')
+
+        # discrete ZDP in the new order of the rows
+        offsets_old = np.concatenate([[0], np.cumsum(lengths)])
+        lengths     = lengths[order]
+        zdp_value_offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        gather      = np.repeat(offsets_old[:-1][order] - zdp_value_offsets[:-1], lengths) + np.arange(zdp_value_offsets[-1])
+        zdp_values  = values[gather]
+
+        # continuous ZDP, the rows of the continuous signs are in the order of addRows
+        row_discrete = sign_is_discrete[sign]
+        zdp_min, zdp_max = np.full(len(sign), np.nan), np.full(len(sign), np.nan)
+        zdp_min[~row_discrete], zdp_max[~row_discrete] = zdp_cont[:, 0], zdp_cont[:, 1]
+        zdp_min, zdp_max = zdp_min[order], zdp_max[order]
+
+        # the signs: possible values of the discrete ones, bounds of the continuous ones
+        period_sign = sign[order]
+        value_sign  = np.repeat(period_sign, lengths)
+        value_order = np.lexsort((zdp_values, value_sign))
+        value_sign, sign_values = value_sign[value_order], zdp_values[value_order]
+        is_new = np.ones(len(sign_values), dtype=bool)
+        is_new[1:] = (value_sign[1:] != value_sign[:-1]) | (sign_values[1:] != sign_values[:-1])
+        value_sign, sign_values = value_sign[is_new], sign_values[is_new]
+        sign_value_offsets = np.concatenate([[0], np.cumsum(np.bincount(value_sign, minlength=signs_count))]).astype(np.int64)
+
+        sign_val_min = np.full(signs_count, np.inf)
+        sign_val_max = np.full(signs_count, -np.inf)
+        np.minimum.at(sign_val_min, period_sign, np.where(np.isnan(zdp_min), np.inf, zdp_min))
+        np.maximum.at(sign_val_max, period_sign, np.where(np.isnan(zdp_max), -np.inf, zdp_max))
+        sign_val_min[sign_is_discrete] = np.nan
+        sign_val_max[sign_is_discrete] = np.nan
+        sign_decimal = np.where(sign_is_discrete, 0, -decimalExponent(np.nan_to_num(sign_val_max - sign_val_min)) + 2)
+        # the smallest value is the normal one of a discrete sign, as in ModelKnowledgeBase.generateSings
+        sign_normal  = np.where(sign_is_discrete, 0, (sign_val_min + sign_val_max) / 2)
+
+        ckb = ColumnarKnowledgeBase(rng                = rng,
+                                    disease_names      = np.array(list(self._diseases)),
+                                    sign_names         = np.array(list(self._signs)),
+                                    sign_is_discrete   = sign_is_discrete,
+                                    sign_val_min       = sign_val_min,
+                                    sign_val_max       = sign_val_max,
+                                    sign_decimal       = sign_decimal.astype(np.int16),
+                                    sign_normal        = sign_normal.astype(np.float64),
+                                    sign_value_offsets = sign_value_offsets,
+                                    sign_values        = sign_values,
+                                    pd_count           = pd_count.astype(np.int8).reshape(disease_count, signs_count),
+                                    pd_offsets         = np.concatenate([[0], np.cumsum(pd_count)]).astype(np.int64),
+                                    period_lo          = lo[order].astype(np.int8),
+                                    period_hi          = hi[order].astype(np.int8),
+                                    zdp_min            = zdp_min,
+                                    zdp_max            = zdp_max,
+                                    zdp_value_offsets  = zdp_value_offsets,
+                                    zdp_values         = zdp_values)
+        self.seconds += time.perf_counter() - start
+        return ckb
+
+
+def importTable(path: str,
+                *,
+                chunk_size: int                        = 1 << 16,
+                rng:        np.random.Generator | None = None,
+                is_print:   bool                       = False) -> ColumnarKnowledgeBase:
+    '''knowledge base of a CSV or JSONL table read chunk by chunk, see iterTableChunks and TableImporter'''
+    importer = TableImporter()
+    start = time.perf_counter()
+    for chunk in iterTableChunks(path, chunk_size):
+        importer.addRows(chunk)
+    ckb = importer.result(rng)
+    if is_print:
+        seconds = time.perf_counter() - start
+        print(f'{path}: строк {importer.rows}, {seconds:.3f} с, {importer.rows / seconds:.0f} строк/с '
+              f'(разбор {importer.rows_per_second:.0f} строк/с)')
+    return ckb
+
+
+if __name__ == '__main__':
+    def checkImportTable(is_print: bool):
+        ckb = importTable(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'table'), is_print=is_print)
+        test = ckb.disease_count == 10 and bool(np.all(ckb.pd_count > 0))
+        if is_print:
+            print(*ckb.toModel().data_frame, sep='\n\n')
+        return test
+
+    def checkRoundTrip(is_print: bool):
+        import tempfile
+        ckb = ColumnarKnowledgeBase.generate(7, 10, seed=3)
+        with tempfile.TemporaryDirectory() as path:
+            ckb.toModel().data_frame[2].to_csv(os.path.join(path, 'table.csv'))
+            loaded = importTable(os.path.join(path, 'table.csv'), chunk_size=17, is_print=is_print)
+        test = np.array_equal(ckb.pd_count, loaded.pd_count)
+        test = test and np.array_equal(ckb.period_lo, loaded.period_lo) and np.array_equal(ckb.period_hi, loaded.period_hi)
+        test = test and np.array_equal(ckb.zdp_value_offsets, loaded.zdp_value_offsets)
+        for a, b in zip(ckb.zdp_value_offsets[:-1], ckb.zdp_value_offsets[1:]):
+            test = test and np.array_equal(np.sort(ckb.zdp_values[a:b]), loaded.zdp_values[a:b])
+        continuous = ~np.isnan(ckb.zdp_min)
+        test = test and np.array_equal(continuous, ~np.isnan(loaded.zdp_min))
+        tolerance = np.power(10.0, -ckb.sign_decimal).max()
+        test = test and np.allclose(ckb.zdp_min[continuous], loaded.zdp_min[continuous], atol=tolerance)
+        test = test and np.allclose(ckb.zdp_max[continuous], loaded.zdp_max[continuous], atol=tolerance)
+        return test
+
+    if not checkImportTable(False):
+        raise SystemError('error checkImportTable')
+    if not checkRoundTrip(False):
+        raise SystemError('error checkRoundTrip')
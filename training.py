@@ -1,10 +1,22 @@
 import model_knowledge_base
+import comparison
+import diagnosis
 import matplotlib.pyplot as plt
 from itertools import product
-from disease import DiseaseExemple, SignOfDiseaseExemple
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import copy
+import json
+import os
+import queue
+import threading
+from disease import DiseaseExemple, SignOfDiseaseExemple, isExamplesBatch, splitExamples
 from typing import TypedDict
 import pandas as pd
 import numpy as np
+from segment_statistics import SegmentStatistics
+from online_segmentation import OnlineSegmentation
+from lazy_knowledge import LazyIGKB, countCandidates
 
 class PosiblePD(TypedDict):
     zdp:         list
@@ -22,24 +34,43 @@ class SignType(str):
         super().__init__(s)
         
         
-def createArayDelimiters(original_array_length: int,
-                         count_dilimetrs:       int ) -> list[int]:
-    if count_dilimetrs == 0:
-        return [[]]
-    stop = [*range(original_array_length-count_dilimetrs, original_array_length)]
-    arr  = []
+def iterDelimiters(original_array_length: int,
+                   count_dilimetrs:       int ):
+    '''lazily enumerates delimiter placements in lexicographic order
     
-    def create(word, i_let):
-        while word[i_let] < stop[i_let]+1:
-            if len(word) < count_dilimetrs:
-                create([*word, word[-1]+1], i_let+1)
-            else:
-                arr.append(word.copy())
-            word[i_let] += 1
-    
-    create([1], 0)
+    Yields tuples of ``count_dilimetrs`` strictly increasing indexes from
+    ``1`` to ``original_array_length - 1``. Nothing but the current tuple
+    is kept in memory. Sending ``depth`` into the generator skips every
+    remaining tuple that shares the first ``depth + 1`` delimiters with
+    the last yielded one (the value returned by ``send`` is the next tuple).
+    '''
+    if count_dilimetrs == 0:
+        yield ()
+        return
+    if original_array_length - 1 < count_dilimetrs:
+        return
     
-    return arr
+    word = list(range(1, count_dilimetrs + 1))
+    last = count_dilimetrs - 1
+    while True:
+        skip = yield tuple(word)
+        if skip is None and word[last] < original_array_length - 1:
+            word[last] += 1
+            continue
+        i = last if skip is None else skip
+        # the largest value for position i is original_array_length - count_dilimetrs + i
+        while i >= 0 and word[i] == original_array_length - count_dilimetrs + i:
+            i -= 1
+        if i < 0:
+            return
+        word[i] += 1
+        for j in range(i + 1, count_dilimetrs):
+            word[j] = word[j - 1] + 1
+
+
+def createArayDelimiters(original_array_length: int,
+                         count_dilimetrs:       int ) -> list[list[int]]:
+    return [list(delimiters) for delimiters in iterDelimiters(original_array_length, count_dilimetrs)]
 
 
 def checkIntersections(a0: tuple[float, float],
@@ -49,83 +80,368 @@ def checkIntersections(a0: tuple[float, float],
     ans = not (a0[1] < a1[0] or a1[1] < a0[0]) 
     return ans
 
+
+def candidateKey(posible_pd: PosiblePD) -> tuple:
+    '''canonical hashable form of a candidate: equal candidates have equal keys'''
+    zdp = tuple(frozenset(val) if isinstance(val, set) else val for val in posible_pd['zdp'])
+    return zdp, tuple(posible_pd['pd_duration'])
+
+
+def isCovered(posible_pd: PosiblePD, other: PosiblePD) -> bool:
+    '''every ZDP and every duration of ``posible_pd`` lies inside the ones of ``other``'''
+    for a, b in zip(posible_pd['pd_duration'], other['pd_duration']):
+        if not (b[0] <= a[0] and a[1] <= b[1]):
+            return False
+    for a, b in zip(posible_pd['zdp'], other['zdp']):
+        if isinstance(a, set):
+            if not (a <= b):
+                return False
+        elif isinstance(a, tuple):
+            if not (b[0] <= a[0] and a[1] <= b[1]):
+                return False
+        elif a & ~b:
+            return False
+    return True
+
+
+def knowledgeDelta(igkb_old: InductivelyGeneratedKnowledgeBase | None,
+                   igkb_new: InductivelyGeneratedKnowledgeBase) -> dict[str, int]:
+    '''how the candidates of one (disease, sign) pair changed in a training step
+    
+    widened: new candidates covering a candidate that is gone, 
+    added: the other new candidates, removed: the gone candidates no new one covers
+    '''
+    ans = {'added': 0, 'removed': 0, 'widened': 0}
+    igkb_old = igkb_old or {}
+    for count_pd in [*igkb_new, *[c for c in igkb_old if c not in igkb_new]]:
+        old = {candidateKey(c): c for c in igkb_old.get(count_pd, [])}
+        new = {candidateKey(c): c for c in igkb_new.get(count_pd, [])}
+        gone  = [c for key, c in old.items() if key not in new]
+        fresh = [c for key, c in new.items() if key not in old]
+        covered = set()
+        for candidate in fresh:
+            hit = [i for i, c in enumerate(gone) if isCovered(c, candidate)]
+            if hit:
+                ans['widened'] += 1
+                covered.update(hit)
+            else:
+                ans['added'] += 1
+        ans['removed'] += len(gone) - len(covered)
+    return ans
+
+
+def candidateScore(posible_pd: PosiblePD) -> tuple:
+    '''the smaller the tighter: summed ZDP widths (value counts for discrete signs), then summed durations'''
+    width = 0
+    for val in posible_pd['zdp']:
+        if isinstance(val, set):
+            width += len(val)
+        elif isinstance(val, tuple):
+            width += val[1] - val[0]
+        else:
+            width += val.bit_count()
+    duration = sum(b - a for a, b in posible_pd['pd_duration'])
+    return width, duration
+
+
+def removeCovered(posible_pd_arr: list[PosiblePD]) -> list[PosiblePD]:
+    '''drops the candidates that another (distinct) candidate covers'''
+    return [a for i, a in enumerate(posible_pd_arr)
+            if not any(i != j and isCovered(a, b) for j, b in enumerate(posible_pd_arr))]
+
+
+def compactInts(values: list[int]) -> np.ndarray:
+    '''values in the smallest signed integer dtype that holds them'''
+    arr = np.array(values, dtype=np.int64)
+    if len(arr) == 0:
+        return arr.astype(np.int8)
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= arr.min() and arr.max() <= info.max:
+            return arr.astype(dtype)
+    return arr
+
+
+def compactNumbers(values: list) -> np.ndarray:
+    '''integral values as compactInts, otherwise float64'''
+    arr = np.array(values, dtype=np.float64)
+    if np.all(arr == np.round(arr)):
+        return compactInts(values)
+    return arr
+
+
+def unpackNumbers(arr: np.ndarray) -> list:
+    '''the values of compactNumbers, integral ones as int'''
+    if arr.dtype.kind in 'iu':
+        return arr.tolist()
+    return [int(v) if v.is_integer() else v for v in arr.tolist()]
+
+
+def packValues(values: list) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    '''discrete values of any signs without one common dtype: the kind of every value
+    (0 - int, 1 - float, 2 - str) and the values of every kind in their own array'''
+    kinds = np.array([0 if isinstance(v, (int, np.integer)) else 1 if isinstance(v, (float, np.floating)) else 2
+                      for v in values], dtype=np.int8)
+    ints   = compactInts([v for v, kind in zip(values, kinds) if kind == 0])
+    floats = np.array([v for v, kind in zip(values, kinds) if kind == 1], dtype=np.float64)
+    strs   = np.array([str(v) for v, kind in zip(values, kinds) if kind == 2], dtype=str)
+    return kinds, ints, floats, strs
+
+
+def unpackValues(kinds: np.ndarray, ints: np.ndarray, floats: np.ndarray, strs: np.ndarray) -> list:
+    '''the values of packValues in their order, as Python int, float and str'''
+    values = np.empty(len(kinds), dtype=object)
+    for kind, pool in enumerate([ints, floats, strs]):
+        values[kinds == kind] = pool.tolist()
+    return values.tolist()
+
+
+def _trainPairsChunk(model, chunk: list[tuple]) -> tuple[list[tuple], dict]:
+    '''process pool task: trains a chunk of (disease, sign) pairs on a copy of the model'''
+    ans = [(disease_name, sign_name, model.trainPair(sign_name, sign_type, exemple, igkb))
+           for disease_name, sign_name, sign_type, exemple, igkb in chunk]
+    return ans, model.pruned_candidates
+
+
+def _trainShard(model, examples: list[dict]) -> tuple[dict, dict]:
+    '''process pool task: folds a shard of examples into a partial knowledge base'''
+    return model.trainShard(examples), model.pruned_candidates
+
+
+def _mergeKnowledge(model, kb_1: dict, kb_2: dict) -> tuple[dict, dict]:
+    '''process pool task: one merge of the tree reduction'''
+    return model.mergeKnowledge(kb_1, kb_2), model.pruned_candidates
+
+
 class InductiveShapingModel():
     def __init__(self,
                  mkb:                       model_knowledge_base.ModelKnowledgeBase,
                  pd_count_max:              int,
-                 count_mesurment_in_pd_max: int                                     ) -> None:
-        self._rng                       = np.random.default_rng() 
+                 count_mesurment_in_pd_max: int,
+                 *,
+                 discrete_bitmask:          bool                                    = False,
+                 prune_covered:             bool                                    = False,
+                 lazy_candidates:           bool                                    = False,
+                 max_candidates_per_count:  int | None                              = None,
+                 max_candidates_per_sign:   int | None                              = None,
+                 max_candidates_total:      int | None                              = None,
+                 rng:                       np.random.Generator | None              = None,
+                 checkpoint_path:           str | None                              = None,
+                 checkpoint_every:          int | None                              = None,
+                 resume_from:               str | None                              = None,
+                 train_on_init:             bool                                    = True) -> None:
+        self._rng                       = mkb.spawnRng() if rng is None else rng
         self.count_pd_max               = pd_count_max
         self.mkb                        = mkb
         self.count_mesurment_in_pd_max  = count_mesurment_in_pd_max
+        # discrete ZDP are stored as int bit masks over SignDiscrete.possible_value
+        # instead of sets and decoded only for display and export
+        self.discrete_bitmask           = discrete_bitmask
+        self._bitmask_signs             = {s.name: s for s in self.mkb._sings_discrete} \
+                                          if discrete_bitmask else {}
+        self._value_bits                = {name: s.value_bits for name, s in self._bitmask_signs.items()}
+        self._sign_types                = {s.name: 'discrete' for s in self.mkb._sings_discrete} | \
+                                          {s.name: 'continuous' for s in self.mkb._signs_continous}
+        # after each union drop the candidates lying inside another candidate
+        self.prune_covered              = prune_covered
+        # findePosiblePD of every example is a LazyIGKB: the PD counts the knowledge base
+        # has no candidates for any more are never searched
+        self.lazy_candidates            = lazy_candidates
+        # candidate budget, None - no limit. Over the budget the tightest
+        # candidates (candidateScore) are kept and the dropped ones are counted
+        self.max_candidates_per_count   = max_candidates_per_count
+        self.max_candidates_per_sign    = max_candidates_per_sign
+        self.max_candidates_total       = max_candidates_total
+        self.pruned_candidates          = {'count': 0, 'sign': 0, 'total': 0}
+        self._executor                  = None
+        self._executor_workers          = 0
+        # training steps (trainModel and trainBatch calls) and examples folded in so far,
+        # every checkpoint_every steps the state is written to checkpoint_path
+        self.steps                      = 0
+        self.examples_seen              = 0
+        self.checkpoint_path            = checkpoint_path
+        self.checkpoint_every           = checkpoint_every
+        # DiagnosisIndex of posible_pd, built on the first diagnose after every training step
+        self._diagnosis_index           = None
 
         self.posible_pd                 = {}
-        first_example = self.mkb.createExample(count_mesurment_in_pd_max=self.count_mesurment_in_pd_max)
+        if resume_from is not None:
+            self.loadCheckpoint(resume_from)
+            return
         for d in self.mkb.disease:
             self.posible_pd[f'{d.name}'] = {}
             for s in self.mkb.signs:
                 self.posible_pd[f'{d.name}'][f'{s.name}'] = {}
-        for disease_name in first_example:
-            disease_exemple = first_example[disease_name]['signs_discrete']
-            for sign_name in disease_exemple:
-                self.posible_pd[disease_name][sign_name] = self.findePosiblePD(disease_exemple[sign_name], 'discrete')
-
-            disease_exemple = first_example[disease_name]['signs_continuous']
-            for sign_name in disease_exemple:
-                self.posible_pd[disease_name][sign_name] = self.findePosiblePD(disease_exemple[sign_name], 'continuous')
+        # without the first example the knowledge base stays empty until fit or partialFit
+        if train_on_init:
+            self._trainExample(self.mkb.createExample(count_mesurment_in_pd_max=self.count_mesurment_in_pd_max))
+            self.examples_seen = 1
 
     def findePosiblePD(self, 
-                       exemple:   SignOfDiseaseExemple, 
-                       sign_type: SignType             ) -> InductivelyGeneratedKnowledgeBase:
+                       exemple:    SignOfDiseaseExemple, 
+                       sign_type:  SignType,
+                       value_bits: dict | None          = None,
+                       lazy:       bool                 = False) -> InductivelyGeneratedKnowledgeBase:
+        '''value_bits: for discrete signs store ZDP as bit masks with these bit numbers
+        lazy: return a LazyIGKB, the candidates of a PD count are searched for when it is read'''
         arr_val         = exemple['value']
         arr_time        = exemple['time']
         igkb = {f'{pd_count+1}':[] for pd_count in range(self.count_pd_max)}
+        if not (sign_type in ['discrete', 'continuous']):
+            raise TypeError(f'{sign_type} not SignType')
+        if lazy:
+            return self._lazyPosiblePD(exemple, sign_type, value_bits)
+        
+        stats  = SegmentStatistics(arr_val, sign_type, value_bits)
+        length = stats.length
         
-        for count_dilimetrs_pd in range(self.count_pd_max):
+        def segment(start: int, end: int):
+            if sign_type == 'discrete':
+                return stats.valueSet(start, end) if value_bits is None else stats.mask(start, end)
+            return stats.bounds(start, end)
+        
+        # depth-first search over delimiters in lexicographic order: the closed
+        # segments are shared by the whole subtree. Segments only grow with their
+        # end, so once the open segment intersects the previous one every longer
+        # segment intersects it too and the rest of the branch is dropped
+        def search(prev_start: int | None, start: int, zdp: list, pd_duration: list):
+            limit = length + 1 if prev_start is None else stats.firstIntersectingEnd(prev_start, start)
+            
+            if limit > length:
+                igkb[f'{len(zdp)+1}'].append({'zdp':         [*zdp, segment(start, length)], 
+                                              'pd_duration': [*pd_duration, (arr_time[start], arr_time[length - 1])]})
+            if len(zdp) + 1 == self.count_pd_max:
+                return
+            for end in range(start + 1, min(limit, length)):
+                search(start, 
+                       end, 
+                       [*zdp, segment(start, end)], 
+                       [*pd_duration, (arr_time[start], arr_time[end - 1])])
         
-            delimiters_arr = createArayDelimiters(len(arr_val), count_dilimetrs_pd)
+        if length > 0:
+            search(None, 0, [], [])
+        return igkb
 
-            for delimiters in delimiters_arr:
-                
-                delimiters.append(None)
-                delimiter_prev = 0
-                v = []
-                
-                for delimiter in delimiters:
-                    
-                    if sign_type == 'discrete':
-                        v.append(set(arr_val[delimiter_prev:delimiter]))
-                        delimiter_prev = delimiter
-                        if len(v)<2:
-                            continue
-                        union_pd = v[-1] & v[-2]
-                        if len(union_pd) != 0:
-                            break
-                    
-                    elif sign_type == 'continuous':
-                        sample = (arr_val[delimiter_prev:delimiter])
-                        v.append((min(sample), max(sample)))
-                        delimiter_prev = delimiter
-                        if len(v)<2:
-                            continue
-                        
-                        if checkIntersections(v[-2], v[-1]):
-                            break
-                        
-                    else:
-                        raise TypeError(f'{sign_type} not SignType')
+    def _lazyPosiblePD(self, 
+                       exemple:    SignOfDiseaseExemple, 
+                       sign_type:  SignType,
+                       value_bits: dict | None) -> LazyIGKB:
+        '''findePosiblePD with a separate search for every PD count, each one run on demand'''
+        arr_val, arr_time = exemple['value'], exemple['time']
+        length = len(arr_val)
+        stats  = []
+        
+        def getStats() -> SegmentStatistics:
+            # the tables are built once, by the first PD count that is read
+            if not stats:
+                stats.append(SegmentStatistics(arr_val, sign_type, value_bits))
+            return stats[0]
+        
+        def segment(start: int, end: int):
+            if sign_type == 'discrete':
+                return getStats().valueSet(start, end) if value_bits is None else getStats().mask(start, end)
+            return getStats().bounds(start, end)
+        
+        # the search of findePosiblePD limited to exactly count_pd segments, so every
+        # segment but the last also leaves at least one measurement to each of the next ones
+        # build=False only counts: the segments are not built and None is yielded
+        def search(count_pd: int, build: bool, prev_start: int | None, start: int, zdp: list, pd_duration: list):
+            limit = length + 1 if prev_start is None else getStats().firstIntersectingEnd(prev_start, start)
+            if len(pd_duration) + 1 == count_pd:
+                if limit > length:
+                    yield {'zdp':         [*zdp, segment(start, length)], 
+                           'pd_duration': [*pd_duration, (arr_time[start], arr_time[length - 1])]} if build else None
+                return
+            for end in range(start + 1, min(limit, length - count_pd + len(pd_duration) + 2)):
+                yield from search(count_pd, build, start, end,
+                                  [*zdp, segment(start, end)] if build else zdp,
+                                  [*pd_duration, (arr_time[start], arr_time[end - 1])])
+        
+        def source(count_pd: int):
+            def candidates(build: bool):
+                if length > 0:
+                    yield from search(count_pd, build, None, 0, [], [])
+            return candidates
+        
+        return LazyIGKB({f'{pd_count+1}': source(pd_count + 1) for pd_count in range(self.count_pd_max)})
 
-                else:
-                    delimiter_prev = 0
-                    time = []
-                    for delimiter in delimiters:
-                        times = arr_time[delimiter_prev:delimiter]
-                        delimiter_prev = delimiter
-                        time.append((times[0], times[-1]))
-                        
-                    igkb[f'{count_dilimetrs_pd+1}'].append({'zdp': v, 'pd_duration': time})
-        return igkb
 
+    def countPosiblePD(self, 
+                       exemple:    SignOfDiseaseExemple, 
+                       sign_type:  SignType,
+                       value_bits: dict | None          = None) -> dict[str, int]:
+        '''number of candidates of findePosiblePD for every PD count, the candidates are not built
+        
+        Dynamic programming over the split points: ways[(prev_start, start)] is the number of 
+        valid segmentations of the measurements before start whose last segment is 
+        [prev_start, start). The next segment [start, end) is valid for every end below 
+        firstIntersectingEnd(prev_start, start), so the ways of a state are added to a range 
+        of ends with a difference array: O(count_pd_max * length^2 * log(length)).
+        '''
+        if not (sign_type in ['discrete', 'continuous']):
+            raise TypeError(f'{sign_type} not SignType')
+        counts = {f'{pd_count+1}': 0 for pd_count in range(self.count_pd_max)}
+        length = len(exemple['value'])
+        if length == 0:
+            return counts
+        
+        stats = SegmentStatistics(exemple['value'], sign_type, value_bits)
+        ways  = {(0, end): 1 for end in range(1, length + 1)}
+        for count_pd in range(1, self.count_pd_max + 1):
+            counts[f'{count_pd}'] = sum(w for (_, start), w in ways.items() if start == length)
+            if count_pd == self.count_pd_max:
+                break
+            diff = {}
+            for (prev_start, start), w in ways.items():
+                if start == length:
+                    continue
+                limit = min(stats.firstIntersectingEnd(prev_start, start), length + 1)
+                d = diff.setdefault(start, [0] * (length + 2))
+                d[start + 1] += w
+                d[limit]     -= w
+            ways = {}
+            for start, d in diff.items():
+                acc = 0
+                for end in range(start + 1, length + 1):
+                    acc += d[end]
+                    if acc:
+                        ways[(start, end)] = acc
+        return counts
+
+    def estimateUnionPD(self, counts_1: dict[str, int], counts_2: dict[str, int]) -> dict[str, int]:
+        '''upper bound of the candidates unionPD keeps for every PD count from the candidate 
+        counts of its arguments: every pair merges into one candidate at most, and 
+        max_candidates_per_count and max_candidates_per_sign cut the rest'''
+        ans = {}
+        for pd_count in range(1, self.count_pd_max + 1):
+            n = counts_1.get(f'{pd_count}', 0) * counts_2.get(f'{pd_count}', 0)
+            for cap in (self.max_candidates_per_count, self.max_candidates_per_sign):
+                if cap is not None:
+                    n = min(n, cap)
+            ans[f'{pd_count}'] = n
+        return ans
+
+    def estimateKnowledge(self, example: dict[str, DiseaseExemple]) -> dict[str, dict[str, dict[str, int]]]:
+        '''upper bound of the candidates of every (disease, sign) pair after partialFit(example),
+        {disease name: {sign name: {PD count: number}}}, to size the workers and the budgets 
+        before training; max_candidates_total is not taken into account'''
+        ans = {}
+        for disease_name in example:
+            for sign_type in ['discrete', 'continuous']:
+                for sign_name, exemple in example[disease_name][f'signs_{sign_type}'].items():
+                    value_bits = self._exempleValueBits(sign_name, sign_type, exemple)
+                    counts = self.countPosiblePD(exemple, sign_type, value_bits)
+                    igkb   = self.posible_pd.get(disease_name, {}).get(sign_name)
+                    # the first example is only cut by the budgets
+                    counts_old = {count_pd: countCandidates(igkb, count_pd) for count_pd in igkb} \
+                                 if igkb else dict.fromkeys(counts, 1)
+                    ans.setdefault(disease_name, {})[sign_name] = self.estimateUnionPD(counts_old, counts)
+        return ans
+
+    def onlineSegmentation(self, sign_name: str, sign_type: SignType) -> OnlineSegmentation:
+        '''findePosiblePD of an example that grows one measurement at a time, see OnlineSegmentation'''
+        value_bits = self._value_bits.get(sign_name) if sign_type == 'discrete' else None
+        return OnlineSegmentation(sign_type, self.count_pd_max, value_bits)
 
     def unionPD(self,
                 igkb_1: InductivelyGeneratedKnowledgeBase,
@@ -135,13 +451,14 @@ class InductiveShapingModel():
         def unionVal(arr1: list, arr2: list, sign_type: SignType):
             ans = []
             if sign_type == 'discrete':
+                # sets and int bit masks share | and & and are falsy when empty
                 for a, b in zip(arr1, arr2):
                     ans.append(a | b)
                     if len(ans)<2:
                         continue
                     
                     union_pd = ans[-1] & ans[-2]
-                    if len(union_pd) != 0:
+                    if union_pd:
                         return None
             elif sign_type == 'continuous':
                 for a, b in zip(arr1, arr2):
@@ -167,13 +484,88 @@ class InductiveShapingModel():
         
         ans = {}
         for count_pd in range(1, self.count_pd_max+1):
-            ans[f'{count_pd}'] = []
+            # a PD count without candidates stays without them, igkb_2 is not read for it
+            if not igkb_1[f'{count_pd}']:
+                ans[f'{count_pd}'] = []
+                continue
+            # different pairs often merge into the same candidate, keep the first one
+            unique = {}
             for combinations in product(igkb_1[f'{count_pd}'], igkb_2[f'{count_pd}']):
                 union_val = unionVal(combinations[0]['zdp'], combinations[1]['zdp'], sign_type)
                 if union_val is not None:
                     union_time = unionTime(combinations[0]['pd_duration'], combinations[1]['pd_duration'])
-                    ans[f'{count_pd}'].append({'zdp': union_val, 'pd_duration': union_time})
-        return ans
+                    candidate = {'zdp': union_val, 'pd_duration': union_time}
+                    unique.setdefault(candidateKey(candidate), candidate)
+            ans[f'{count_pd}'] = list(unique.values())
+            if self.prune_covered:
+                ans[f'{count_pd}'] = removeCovered(ans[f'{count_pd}'])
+        return self.limitCandidates(ans)
+
+    def limitCandidates(self, 
+                        igkb: InductivelyGeneratedKnowledgeBase, 
+                        max_candidates_per_sign: int | None = None,
+                        counter:                 str        = 'sign') -> InductivelyGeneratedKnowledgeBase:
+        '''applies max_candidates_per_count and max_candidates_per_sign to one (disease, sign) pair'''
+        if max_candidates_per_sign is None:
+            max_candidates_per_sign = self.max_candidates_per_sign
+        
+        if self.max_candidates_per_count is not None:
+            for count_pd, candidates in igkb.items():
+                if len(candidates) > self.max_candidates_per_count:
+                    self.pruned_candidates['count'] += len(candidates) - self.max_candidates_per_count
+                    igkb[count_pd] = sorted(candidates, key=candidateScore)[:self.max_candidates_per_count]
+        
+        if max_candidates_per_sign is not None:
+            total = sum(len(candidates) for candidates in igkb.values())
+            if total > max_candidates_per_sign:
+                keep = {(count_pd, i) for _, _, count_pd, i in self._rankCandidates(igkb)[:max_candidates_per_sign]}
+                for count_pd, candidates in igkb.items():
+                    igkb[count_pd] = [c for i, c in enumerate(candidates) if (count_pd, i) in keep]
+                self.pruned_candidates[counter] += total - max_candidates_per_sign
+        return igkb
+
+    @staticmethod
+    def _rankCandidates(igkb: InductivelyGeneratedKnowledgeBase) -> list[tuple]:
+        '''(rank in its PD count, candidateScore, PD count, index) of every candidate, best first;
+        the best candidates of every PD count go first, so no count loses all of them
+        while another one keeps its worst'''
+        ranked = []
+        for count_pd, candidates in igkb.items():
+            scores = [(candidateScore(c), i) for i, c in enumerate(candidates)]
+            for rank, (score, i) in enumerate(sorted(scores)):
+                ranked.append((rank, score, count_pd, i))
+        return sorted(ranked)
+
+    def limitTotalCandidates(self):
+        '''applies max_candidates_total: every (disease, sign) pair is cut to the same
+        largest share that fits the budget, pairs below the share are left as is;
+        the budget left under the share goes to the best next candidates of the cut pairs.
+        The total never exceeds the budget, with a budget smaller than the number of pairs
+        some pairs lose all their candidates'''
+        if self.max_candidates_total is None:
+            return
+        sizes = {(d, s): sum(len(candidates) for candidates in igkb.values())
+                 for d in self.posible_pd for s, igkb in self.posible_pd[d].items()}
+        if sum(sizes.values()) <= self.max_candidates_total:
+            return
+        
+        lo, hi = 0, max(sizes.values())
+        while lo < hi:
+            share = (lo + hi + 1) // 2
+            if sum(min(size, share) for size in sizes.values()) <= self.max_candidates_total:
+                lo = share
+            else:
+                hi = share - 1
+        share = lo
+        
+        # share + 1 for every cut pair does not fit, the spare places go to the pairs
+        # whose candidate number share + 1 is the tightest
+        over  = [pair for pair, size in sizes.items() if size > share]
+        spare = self.max_candidates_total - sum(min(size, share) for size in sizes.values())
+        next_score = {(d, s): self._rankCandidates(self.posible_pd[d][s])[share][1] for d, s in over}
+        extra = set(sorted(over, key=lambda pair: next_score[pair])[:spare])
+        for d, s in over:
+            self.posible_pd[d][s] = self.limitCandidates(self.posible_pd[d][s], share + ((d, s) in extra), 'total')
 
     
     def interpretPDTime(self,
@@ -195,19 +587,425 @@ class InductiveShapingModel():
             ans.append((min, max))
         return ans
 
-    def trainModel(self):
-        example = self.mkb.createExample(count_mesurment_in_pd_max=self.count_mesurment_in_pd_max)
+    def _exempleValueBits(self, sign_name: str, sign_type: SignType, exemple: SignOfDiseaseExemple) -> dict | None:
+        '''bit numbers of a discrete sign stored as bit masks, every measured value must have one'''
+        value_bits = self._value_bits.get(sign_name) if sign_type == 'discrete' else None
+        if value_bits is not None:
+            for val in exemple['value']:
+                if val not in value_bits:
+                    raise TypeError(f'вообщето y признака "{sign_name}" значения "{val}" нет, '
+                                    f'а discrete_bitmask кодирует только {list(value_bits)}')
+        return value_bits
+
+    def trainPair(self,
+                  sign_name: str,
+                  sign_type: SignType,
+                  exemple:   SignOfDiseaseExemple,
+                  igkb:      InductivelyGeneratedKnowledgeBase | None) -> InductivelyGeneratedKnowledgeBase:
+        '''one training step for one (disease, sign) pair, igkb is None for the first example'''
+        value_bits = self._exempleValueBits(sign_name, sign_type, exemple)
+        posible = self.findePosiblePD(exemple, sign_type, value_bits, lazy=self.lazy_candidates)
+        if igkb is None:
+            return self.limitCandidates(posible.materialize() if self.lazy_candidates else posible)
+        return self.unionPD(igkb, posible, sign_type)
+
+    def trainModel(self, 
+                   workers:       int | None                  = None, 
+                   pairs:         set[tuple[str, str]] | None = None, 
+                   return_deltas: bool                        = False):
+        '''one training step on a new example of mkb, see partialFit'''
+        return self.partialFit(self.mkb.createExample(count_mesurment_in_pd_max=self.count_mesurment_in_pd_max),
+                               workers, pairs, return_deltas)
+
+    def partialFit(self, 
+                   example:       dict, 
+                   workers:       int | None                  = None, 
+                   pairs:         set[tuple[str, str]] | None = None, 
+                   return_deltas: bool                        = False):
+        '''one training step on a given example
+        
+        example: {disease name: DiseaseExemple} as mkb.createExample() returns, or a batch 
+        {disease name: DiseaseExemples} as mkb.createExamples(n) returns, then it is n steps.
+        workers: the (disease, sign) pairs are independent, with workers > 1 they 
+        are trained in a process pool in about 4 chunks per worker
+        pairs: train only these (disease name, sign name) pairs, None - all of them
+        return_deltas: compare every trained pair with its previous candidates, 
+        it costs up to a quadratic number of isCovered checks per pair
+        
+        Returns
+        ----------
+        None, with return_deltas {disease name: {sign name: knowledgeDelta}} of the 
+        trained pairs, summed over a batch
+        '''
+        if isExamplesBatch(example):
+            deltas = {}
+            for one in splitExamples(example):
+                for disease_name, signs in (self.partialFit(one, workers, pairs, return_deltas) or {}).items():
+                    for sign_name, delta in signs.items():
+                        total = deltas.setdefault(disease_name, {}).setdefault(sign_name, dict.fromkeys(delta, 0))
+                        for key in delta:
+                            total[key] += delta[key]
+            return deltas if return_deltas else None
+        deltas = self._trainExample(example, workers, pairs, return_deltas)
+        self._finishStep(1)
+        return deltas
+
+    def _trainExample(self, 
+                      example:       dict[str, DiseaseExemple], 
+                      workers:       int | None                  = None,
+                      pairs:         set[tuple[str, str]] | None = None,
+                      return_deltas: bool                        = False) -> dict[str, dict[str, dict[str, int]]] | None:
+        tasks = []
         for disease_name in example:
-            
-            disease_exemple = example[disease_name]['signs_discrete']
-            for sign_name in disease_exemple:
-                posible = self.findePosiblePD(disease_exemple[sign_name], 'discrete')
-                self.posible_pd[disease_name][sign_name] = self.unionPD(self.posible_pd[disease_name][sign_name], posible, 'discrete')
-                
-            disease_exemple = example[disease_name]['signs_continuous']
-            for sign_name in disease_exemple:
-                posible = self.findePosiblePD(disease_exemple[sign_name], 'continuous')
-                self.posible_pd[disease_name][sign_name] = self.unionPD(self.posible_pd[disease_name][sign_name], posible, 'continuous')
+            igkb_disease = self.posible_pd.setdefault(disease_name, {})
+            for sign_type in ['discrete', 'continuous']:
+                disease_exemple = example[disease_name][f'signs_{sign_type}']
+                for sign_name in disease_exemple:
+                    if pairs is not None and (disease_name, sign_name) not in pairs:
+                        continue
+                    self._sign_types.setdefault(sign_name, sign_type)
+                    # a pair without candidates yet ({}) starts from this example
+                    tasks.append((disease_name, sign_name, sign_type, disease_exemple[sign_name],
+                                  igkb_disease.get(sign_name) or None))
+
+        if workers is None or workers <= 1:
+            for disease_name, sign_name, sign_type, exemple, igkb in tasks:
+                self.posible_pd[disease_name][sign_name] = self.trainPair(sign_name, sign_type, exemple, igkb)
+        else:
+            for disease_name, sign_name, igkb in self._mapPairs(tasks, workers):
+                self.posible_pd[disease_name][sign_name] = igkb
+        self.limitTotalCandidates()
+        if not return_deltas:
+            return None
+        
+        deltas = {}
+        for disease_name, sign_name, _, _, igkb in tasks:
+            deltas.setdefault(disease_name, {})[sign_name] = knowledgeDelta(igkb, self.posible_pd[disease_name][sign_name])
+        return deltas
+
+    def trainUntilConverged(self, 
+                            patience:  int        = 3, 
+                            max_steps: int        = 100, 
+                            workers:   int | None = None) -> tuple[int, set[tuple[str, str]]]:
+        '''trainModel until every (disease, sign) pair has not changed for patience steps in a row
+        
+        A converged pair is not trained any more, the next steps train the rest only.
+        Only the pairs of mkb take part: the examples come from mkb.createExample, 
+        pairs added by partialFit from other examples would never be trained.
+        
+        Returns
+        ----------
+        the number of steps made and the converged (disease name, sign name) pairs
+        '''
+        stable = {(d.name, s.sign.name): 0 for d in self.mkb.disease for s in d.signs}
+        converged = set()
+        steps = 0
+        while steps < max_steps and len(converged) < len(stable):
+            deltas = self.trainModel(workers, set(stable) - converged, return_deltas=True)
+            steps += 1
+            if not deltas:
+                break
+            for disease_name, signs in deltas.items():
+                for sign_name, delta in signs.items():
+                    pair = (disease_name, sign_name)
+                    stable[pair] = 0 if any(delta.values()) else stable.get(pair, 0) + 1
+                    if stable[pair] >= patience:
+                        converged.add(pair)
+        return steps, converged
+
+    def fit(self, examples, *, queue_size: int = 8, workers: int | None = None):
+        '''partialFit on every example of an iterable or an async iterable
+        
+        The examples are taken from the iterator in a separate thread and passed
+        through a queue of at most queue_size examples, so reading or generating 
+        the next examples overlaps with training on the current one.
+        '''
+        examples_queue = queue.Queue(maxsize=queue_size)
+        stop = threading.Event()
+        done = object()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    examples_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        async def produceAsync():
+            async for example in examples:
+                if not put(example):
+                    return
+
+        def produce():
+            try:
+                if hasattr(examples, '__aiter__'):
+                    asyncio.run(produceAsync())
+                else:
+                    for example in examples:
+                        if not put(example):
+                            return
+            except BaseException as err:
+                put(err)
+            put(done)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while (example := examples_queue.get()) is not done:
+                if isinstance(example, BaseException):
+                    raise example
+                self.partialFit(example, workers)
+        finally:
+            stop.set()
+            producer.join()
+        return self
+
+    def trainShard(self, examples: list[dict]) -> dict[str, dict[str, InductivelyGeneratedKnowledgeBase]]:
+        '''folds examples into a new partial knowledge base, posible_pd is not touched'''
+        kb = {}
+        for example in examples:
+            for disease_name in example:
+                kb_disease = kb.setdefault(disease_name, {})
+                for sign_type in ['discrete', 'continuous']:
+                    disease_exemple = example[disease_name][f'signs_{sign_type}']
+                    for sign_name in disease_exemple:
+                        kb_disease[sign_name] = self.trainPair(sign_name, sign_type, disease_exemple[sign_name],
+                                                               kb_disease.get(sign_name))
+        return kb
+
+    def mergeKnowledge(self, 
+                       kb_1: dict[str, dict[str, InductivelyGeneratedKnowledgeBase]], 
+                       kb_2: dict[str, dict[str, InductivelyGeneratedKnowledgeBase]]):
+        '''unionPD of every (disease, sign) pair of two partial knowledge bases'''
+        ans = {}
+        for disease_name in [*kb_1, *[d for d in kb_2 if d not in kb_1]]:
+            kb_disease_1 = kb_1.get(disease_name, {})
+            kb_disease_2 = kb_2.get(disease_name, {})
+            ans[disease_name] = {}
+            for sign_name in [*kb_disease_1, *[s for s in kb_disease_2 if s not in kb_disease_1]]:
+                igkb_1 = kb_disease_1.get(sign_name)
+                igkb_2 = kb_disease_2.get(sign_name)
+                if not igkb_1 or not igkb_2:
+                    ans[disease_name][sign_name] = igkb_1 or igkb_2
+                else:
+                    ans[disease_name][sign_name] = self.unionPD(igkb_1, igkb_2, self._sign_types[sign_name])
+        return ans
+
+    def trainBatch(self, n_examples: int, shards: int = 1, workers: int | None = None):
+        '''trains on n_examples new examples at once
+        
+        The examples are split into shards, every shard is folded into its own
+        partial knowledge base and the partial ones are merged pairwise in a tree
+        of log2(shards) levels. With workers > 1 the shards and the merges of one
+        level run in the process pool.
+        '''
+        examples = [self.mkb.createExample(count_mesurment_in_pd_max=self.count_mesurment_in_pd_max)
+                    for _ in range(n_examples)]
+        shards = max(1, min(shards, n_examples))
+        parts  = [examples[i * n_examples // shards:(i + 1) * n_examples // shards] for i in range(shards)]
+
+        if workers is None or workers <= 1:
+            kbs = [self.trainShard(part) for part in parts]
+            while len(kbs) > 1:
+                kbs = [self.mergeKnowledge(kbs[i], kbs[i + 1]) if i + 1 < len(kbs) else kbs[i]
+                       for i in range(0, len(kbs), 2)]
+        else:
+            executor = self._getExecutor(workers)
+            model    = self._workerCopy()
+            kbs = self._collect([executor.submit(_trainShard, model, part) for part in parts])
+            while len(kbs) > 1:
+                merged = self._collect([executor.submit(_mergeKnowledge, model, kbs[i], kbs[i + 1])
+                                        for i in range(0, len(kbs) - 1, 2)])
+                kbs = merged + kbs[len(kbs) - len(kbs) % 2:]
+
+        if kbs:
+            self.posible_pd = self.mergeKnowledge(self.posible_pd, kbs[0])
+        self.limitTotalCandidates()
+        self._finishStep(n_examples)
+
+    def _finishStep(self, n_examples: int):
+        self.steps         += 1
+        self.examples_seen += n_examples
+        self._diagnosis_index = None
+        if self.checkpoint_path is not None and self.checkpoint_every and self.steps % self.checkpoint_every == 0:
+            self.saveCheckpoint(self.checkpoint_path)
+
+    def _generators(self) -> list[np.random.Generator]:
+        '''every generator the training draws from, in a fixed order: the model's own, 
+        the ones of the knowledge base and of its objects, each generator once'''
+        generators = [self._rng, self.mkb._rng, *self.mkb._streams.values()]
+        for d in self.mkb.disease:
+            for sign in d.signs:
+                generators += [sign._rng, sign.sign._rng, sign.periods_dynamic._rng]
+        return list({id(g): g for g in generators}.values())
+
+    def _packKnowledge(self) -> tuple[list, dict[str, np.ndarray]]:
+        '''posible_pd as flat arrays: a row per candidate, a row per period of a candidate,
+        the ZDP of continuous periods as bounds and of discrete ones CSR-style;
+        a discrete value keeps its type, a time is stored as float only if it is not an int'''
+        pairs = [(d, s) for d in self.posible_pd for s in self.posible_pd[d]]
+        pair_empty, cand_pair, cand_count, pd_start, pd_end = [], [], [], [], []
+        zdp_min, zdp_max, zdp_lengths, zdp_values = [], [], [], []
+        for p, (disease_name, sign_name) in enumerate(pairs):
+            igkb = self.posible_pd[disease_name][sign_name]
+            pair_empty.append(len(igkb) == 0)
+            is_discrete = self._sign_types[sign_name] == 'discrete'
+            for count_pd, candidates in igkb.items():
+                for candidate in candidates:
+                    cand_pair.append(p)
+                    cand_count.append(int(count_pd))
+                    for a, b in candidate['pd_duration']:
+                        pd_start.append(a)
+                        pd_end.append(b)
+                    for zdp in self.decodeZDP(sign_name, candidate['zdp']):
+                        if is_discrete:
+                            zdp_lengths.append(len(zdp))
+                            zdp_values += sorted(zdp)
+                        else:
+                            zdp_min.append(zdp[0])
+                            zdp_max.append(zdp[1])
+        arrays = {'pair_empty':        np.array(pair_empty, dtype=bool),
+                  'cand_pair':         compactInts(cand_pair),
+                  'cand_count':        compactInts(cand_count),
+                  'pd_start':          compactNumbers(pd_start),
+                  'pd_end':            compactNumbers(pd_end),
+                  'zdp_min':           np.array(zdp_min, dtype=np.float64),
+                  'zdp_max':           np.array(zdp_max, dtype=np.float64),
+                  'zdp_lengths':       compactInts(zdp_lengths)}
+        # one array for the values of all signs would turn every int into a str if a sign has str values
+        arrays['zdp_kinds'], arrays['zdp_values'], arrays['zdp_values_float'], arrays['zdp_values_str'] = \
+            packValues(zdp_values)
+        return pairs, arrays
+
+    def _unpackKnowledge(self, pairs: list, arrays: dict[str, np.ndarray]) -> dict:
+        cand_pair, cand_count = arrays['cand_pair'].tolist(), arrays['cand_count'].tolist()
+        pd_start, pd_end      = unpackNumbers(arrays['pd_start']), unpackNumbers(arrays['pd_end'])
+        zdp_min, zdp_max      = arrays['zdp_min'].tolist(), arrays['zdp_max'].tolist()
+        offsets = np.concatenate([[0], np.cumsum(arrays['zdp_lengths'], dtype=np.int64)]).tolist()
+        if 'zdp_kinds' in arrays:
+            values = unpackValues(arrays['zdp_kinds'], arrays['zdp_values'],
+                                  arrays['zdp_values_float'], arrays['zdp_values_str'])
+        else:
+            # version 1: the values of all signs in one array
+            values = arrays['zdp_values'].tolist()
+
+        posible_pd = {}
+        for (disease_name, sign_name), is_empty in zip(pairs, arrays['pair_empty'].tolist()):
+            posible_pd.setdefault(disease_name, {})[sign_name] = \
+                {} if is_empty else {f'{pd_count+1}': [] for pd_count in range(self.count_pd_max)}
+        
+        row, row_discrete, row_continuous = 0, 0, 0
+        for p, count_pd in zip(cand_pair, cand_count):
+            disease_name, sign_name = pairs[p]
+            if self._sign_types[sign_name] == 'discrete':
+                zdp = [set(values[offsets[i]:offsets[i + 1]]) for i in range(row_discrete, row_discrete + count_pd)]
+                if sign_name in self._bitmask_signs:
+                    zdp = [self._bitmask_signs[sign_name].encodeValues(z) for z in zdp]
+                row_discrete += count_pd
+            else:
+                zdp = [(zdp_min[i], zdp_max[i]) for i in range(row_continuous, row_continuous + count_pd)]
+                row_continuous += count_pd
+            posible_pd[disease_name][sign_name][f'{count_pd}'].append(
+                {'zdp': zdp, 'pd_duration': [(pd_start[i], pd_end[i]) for i in range(row, row + count_pd)]})
+            row += count_pd
+        return posible_pd
+
+    def saveCheckpoint(self, path: str):
+        '''posible_pd, step counters and generator states in one .npz without pickle
+        
+        The file is written next to path and moved over it, so a crash leaves
+        either the old checkpoint or the new one.
+        '''
+        pairs, arrays = self._packKnowledge()
+        header = {'version':           2,
+                  'count_pd_max':      self.count_pd_max,
+                  'discrete_bitmask':  self.discrete_bitmask,
+                  'steps':             self.steps,
+                  'examples_seen':     self.examples_seen,
+                  'pruned_candidates': self.pruned_candidates,
+                  'pairs':             pairs,
+                  # partialFit may add signs mkb does not have, a fresh model would not know their type
+                  'sign_types':        {sign_name: self._sign_types[sign_name] for _, sign_name in pairs},
+                  'generators':        [g.bit_generator.state for g in self._generators()]}
+        arrays['header'] = np.frombuffer(json.dumps(header, ensure_ascii=False).encode('utf-8'), dtype=np.uint8)
+        
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def loadCheckpoint(self, path: str):
+        '''continues from a checkpoint of a model over the same knowledge base (same seed or a loaded one)'''
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files}
+        header = json.loads(arrays.pop('header').tobytes().decode('utf-8'))
+        if header['count_pd_max'] != self.count_pd_max:
+            raise TypeError(f'в контрольной точке {path} не более {header["count_pd_max"]} ПД, а у модели {self.count_pd_max}')
+        generators = self._generators()
+        if len(header['generators']) != len(generators):
+            raise TypeError(f'контрольная точка {path} сделана для другой базы знаний')
+        
+        pairs = [tuple(pair) for pair in header['pairs']]
+        self._sign_types.update(header.get('sign_types', {}))
+        self.posible_pd        = self._unpackKnowledge(pairs, arrays)
+        self.steps             = header['steps']
+        self.examples_seen     = header['examples_seen']
+        self._diagnosis_index  = None
+        self.pruned_candidates = header['pruned_candidates']
+        for g, state in zip(generators, header['generators']):
+            g.bit_generator.state = state
+
+    def _collect(self, futures: list) -> list:
+        '''results of the pool tasks in order, their pruning counters are added to ours'''
+        ans = []
+        for future in futures:
+            result, pruned = future.result()
+            ans.append(result)
+            for key in pruned:
+                self.pruned_candidates[key] += pruned[key]
+        return ans
+
+    def _workerCopy(self):
+        '''a copy without the knowledge bases, small enough to send with every chunk'''
+        model = copy.copy(self)
+        model.mkb               = None
+        model.posible_pd        = None
+        model._executor         = None
+        model._diagnosis_index  = None
+        model.pruned_candidates = {key: 0 for key in self.pruned_candidates}
+        return model
+
+    def _getExecutor(self, workers: int) -> ProcessPoolExecutor:
+        if self._executor is None or self._executor_workers != workers:
+            self.closeWorkers()
+            self._executor         = ProcessPoolExecutor(max_workers=workers)
+            self._executor_workers = workers
+        return self._executor
+
+    def _mapPairs(self, tasks: list[tuple], workers: int) -> list[tuple]:
+        executor   = self._getExecutor(workers)
+        chunk_size = max(1, -(-len(tasks) // (workers * 4)))
+        model      = self._workerCopy()
+        futures    = [executor.submit(_trainPairsChunk, model, tasks[i:i + chunk_size])
+                      for i in range(0, len(tasks), chunk_size)]
+        return [pair for chunk_ans in self._collect(futures) for pair in chunk_ans]
+
+    def closeWorkers(self):
+        '''shuts down the process pool kept between trainModel calls'''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def decodeZDP(self, sign_name: str, zdp: list) -> list:
+        '''ZDP of a candidate with discrete bit masks turned back into sets'''
+        if sign_name not in self._bitmask_signs:
+            return zdp
+        sign = self._bitmask_signs[sign_name]
+        return [sign.decodeMask(mask) for mask in zdp]
 
     def printIGKB(self):
         for desease_name in self.posible_pd:
@@ -218,104 +1016,87 @@ class InductiveShapingModel():
                     print('\t\t', count_pd, ' периодов:')
                     for pd in self.posible_pd[desease_name][sign_name][count_pd]:
                         
-                        print('\t\t\t', pd['zdp'], '  //  ' , self.interpretPDTime(pd['pd_duration']))
+                        print('\t\t\t', self.decodeZDP(sign_name, pd['zdp']), '  //  ' , self.interpretPDTime(pd['pd_duration']))
                  
                  
                  
-    # !!!!!! Костыли, долго, некрасиво !!!!!!!
+    def diagnosisIndex(self) -> diagnosis.DiagnosisIndex:
+        '''DiagnosisIndex of posible_pd; training steps rebuild it, changes of posible_pd by hand do not'''
+        if self._diagnosis_index is None:
+            self._diagnosis_index = diagnosis.DiagnosisIndex.fromModel(self)
+        return self._diagnosis_index
+
+    def diagnose(self, example: dict) -> list[str]:
+        '''diseases of the learned knowledge base consistent with the DiseaseExemple of a patient'''
+        return self.diagnosisIndex().diagnose(example)
+
+    def diagnoseBatch(self, examples) -> pd.DataFrame:
+        '''share of every patient's measurements every disease explains, see DiagnosisIndex.diagnoseBatch'''
+        return self.diagnosisIndex().diagnoseBatch(examples)
+
     def comparisonCountPD_IGKB_MKB(self):
-        dta_1, data_2, data_3 = self.mkb.data_frame
-        d = [x.name for x in self.mkb.disease for _ in self.mkb.signs]
-        s = [x.name for _ in self.mkb.disease for x in self.mkb.signs]
-        count_pd = [[data_2.loc[d_i, s_i] for d_i, s_i in zip(d, s)],
-                    []]
-        for d_i, s_i in zip(d, s):
-            for i in range(self.count_pd_max, 0, -1):
-                if len(self.posible_pd[d_i][s_i][f'{i}']) > 0:
-                    break
-            count_pd[1].append(i)
-            
-        a = pd.DataFrame(zip(count_pd[0], count_pd[1]), index=[d, s])
-        a.columns     = ['ЧПД МБЗ', 'ИФБЗ']
-        a.index.names = ['болезнь', 'признак']
-        data_count_pd_match = a['ЧПД МБЗ'] == a['ИФБЗ']
-        data_count_pd_match = \
-            np.around(
-                data_count_pd_match
-                    .groupby(level=0)
-                    .sum() / len(self.mkb.signs) * 100,
-                1)
-
-        return a, data_count_pd_match, np.around(np.mean(data_count_pd_match), 1)
+        '''ЧПД of the model knowledge base against the learned one, see comparison.comparisonCountPD'''
+        return comparison.comparisonCountPD(self)
 
     def comparisonZDP_IGKB_MKB(self):
-        dta_1, data_2, data_3 = self.mkb.data_frame
-        a = self.comparisonCountPD_IGKB_MKB()[0]
-        data_check  = data_3.loc[a['ЧПД МБЗ'] == a['ИФБЗ']]
-        mult_ind    = data_check.index
-        tuples      = []
-        zdp_igkb    = []
-        zdp_mkb     = []
-        for disease, sign, pd_num in mult_ind:
-            pd_count = data_2.loc[disease, sign]
-            for i, posible_answer in enumerate(self.posible_pd[disease][sign][f'{pd_count}']):
-                zdp_igkb.append((np.array([*posible_answer['zdp'][pd_num-1]])))
-                zdp_mkb.append(data_3.loc[(disease, sign, pd_num), 'ЗДП'])
-                tuples.append((disease, sign, i+1, pd_num))
-        
-        mult_ind_2 = pd.MultiIndex.from_tuples(tuples, names=["заболевание", "признак","вариант решения", "номер ПД"])
-        temp = pd.DataFrame(zip(zdp_igkb, zdp_mkb), index=mult_ind_2)
-        temp = temp.sort_index(level=[0,1,2,3])
-        
-        temp.columns = ['ЗДП для ИФБЗ', 'ЗДП для МБЗ']
-        
-        mult_ind_disease_sign = temp.groupby(level=[0, 1]).count().index
-        ans = []
-        for disease, sign in mult_ind_disease_sign:
-            sign_of_illness         = temp.loc[(disease, sign)]
-            count_identica_matc     = 0
-            count_igkb_subset_mkb   = 0
-            count_mkb_subset_igkb   = 0
-            count_else              = 0
-            count_all               = 0
-            for a in sign_of_illness.values:
-                count_all += 1
-                
-                if sign.split()[0] == 'дискретный':
-                    set_1, set_2 = set(a[0]), set(a[1])
-                    if len(set_1) == len(set_2) == len(set_1 | set_2):
-                        count_identica_matc   += 1
-                    elif len(set_1 | set_2) == len(set_2):
-                        count_igkb_subset_mkb += 1
-                    elif len(set_1 | set_2) == len(set_1):
-                        count_mkb_subset_igkb += 1
-                    else:
-                        count_else            += 1
-                elif sign.split()[0] == 'непрерывный':
-                    min_1, max_1 = a[0]
-                    min_2, max_2 = a[1]
-                    if min_1 == min_2 and max_1 == max_2:
-                        count_identica_matc   += 1
-                    elif min_2 <= min_1 <= max_1 <= max_2:
-                        count_igkb_subset_mkb += 1
-                    elif min_1 <= min_2 <= max_2 <= max_1:
-                        count_mkb_subset_igkb += 1
-                    else:
-                        count_else            += 1
-                    
-                else:
-                    raise TypeError("Я не знаю тип признака")
-                
-                
-            ans.append(np.around(
-                np.array([count_identica_matc, count_igkb_subset_mkb, count_mkb_subset_igkb, count_else]) / count_all * 100,
-                1
-                ))
-        data_ans = pd.DataFrame(ans, index= mult_ind_disease_sign)
-        data_ans.columns = ['совпадает', 'ИФБЗ подмножество МБЗ', 'МБЗ подмножество ИФБЗ', 'другое']
-        return temp, data_ans
+        '''ZDP of the candidates against the model knowledge base, see comparison.comparisonZDP'''
+        return comparison.comparisonZDP(self)
         
 if __name__ == '__main__':
+    def checkCheckpoint(is_print: bool):
+        import tempfile
+        import columnar_knowledge_base
+
+        def knowledge(model) -> dict:
+            return {(d, s): {count_pd: [candidateKey({'zdp': model.decodeZDP(s, c['zdp']), 'pd_duration': c['pd_duration']})
+                                        for c in candidates]
+                             for count_pd, candidates in igkb.items()}
+                    for d in model.posible_pd for s, igkb in model.posible_pd[d].items()}
+
+        def build():
+            return columnar_knowledge_base.ColumnarKnowledgeBase.generate(3, 4, seed=1, boundaries_value_exponent_cont=[2, 3]).toModel()
+
+        test = True
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'checkpoint.npz')
+            # examples of mkb: the resumed model continues the same way
+            a = InductiveShapingModel(build(), 3, 3, discrete_bitmask=True)
+            a.trainModel()
+            a.saveCheckpoint(path)
+            a.trainModel()
+            b = InductiveShapingModel(build(), 3, 3, discrete_bitmask=True, resume_from=path)
+            b.trainModel()
+            test = test and knowledge(a) == knowledge(b)
+
+            # external examples: a disease and a sign mkb does not have
+            a = InductiveShapingModel(build(), 3, 3, train_on_init=False)
+            external = {'новая болезнь': {'signs_discrete':   {'новый признак': {'time': [1, 2, 5], 'value': [7, 7, 8]}},
+                                          'signs_continuous': {}}}
+            a.partialFit(external)
+            a.saveCheckpoint(path)
+            b = InductiveShapingModel(build(), 3, 3, train_on_init=False, resume_from=path)
+            test = test and knowledge(a) == knowledge(b) and b._sign_types['новый признак'] == 'discrete'
+            b.partialFit(external)
+
+            # int and str discrete values and float times: every value comes back with its type
+            a = InductiveShapingModel(build(), 3, 3)
+            external = {'новая болезнь': {'signs_discrete':   {'буквенный признак': {'time': [0.5, 2, 3.5], 'value': ['a', 'b', 'c']}},
+                                          'signs_continuous': {}}}
+            a.partialFit(external)
+            a.saveCheckpoint(path)
+            b = InductiveShapingModel(build(), 3, 3, train_on_init=False, resume_from=path)
+            types = lambda model: {(d, s): {isinstance(v, str) for candidates in igkb.values() for c in candidates
+                                            for z in c['zdp'] for v in z}
+                                   for d in model.posible_pd for s, igkb in model.posible_pd[d].items()
+                                   if model._sign_types[s] == 'discrete'}
+            test = test and knowledge(a) == knowledge(b) and types(a) == types(b)
+        if is_print:
+            b.printIGKB()
+        return test
+
+    if not checkCheckpoint(False):
+        raise SystemError('error checkCheckpoint')
+
     mkb = model_knowledge_base.ModelKnowledgeBase(signs_count   = 3,
                                                   disease_count = 3 )
     mkb.generateSings(boundaries_value_exponent_cont = [2, 3],